@@ -19,14 +19,10 @@ Usage: python aixi.py [-a | --agent <agent module name>]
                       [<environment configuration file name to load>]
 """
 
-from __future__ import division
-from __future__ import print_function
-from __future__ import unicode_literals
-
 import os
 import sys
 
-import six.moves.configparser as configparser
+import configparser
 
 try:
     import cProfile as profile
@@ -34,19 +30,10 @@ except:
     import profile
 # end try
 
-try:
-    import cStringIO as StringIO
-except:
-    try:
-        import StringIO
-    except:
-        import io as StringIO
-    # end try
-# end try
-
 import datetime
 import getopt
 import inspect
+import io
 import logging
 import random
 import sys
@@ -83,9 +70,6 @@ def interaction_loop(agent = None, environment = None, options = {}):
         (Called `mainLoop` in the C++ version.)
     """
 
-    # Apply a random seed (Default: 0)
-    random.seed(int(options.get("random-seed", 0)))
-
     # Verbose output (Default: False)
     verbose = bool(options.get("verbose", False))
 
@@ -323,11 +307,11 @@ def main(argv):
         # end if
 
         # Convert the contents into an in-memory file-like object, for parsing.
-        config_stringio = StringIO.StringIO(config_contents)
+        config_stringio = io.StringIO(config_contents)
 
         # Parse the given options, giving the default options as defaults to the parser.
         config = configparser.RawConfigParser(default_options)
-        config.readfp(config_stringio)
+        config.read_file(config_stringio)
 
         # Get the configuration options read in as a dictionary.
         # (This should exist in a section called 'environment'.)
@@ -436,6 +420,10 @@ def main(argv):
         sys.exit(1)
     # end if
 
+    # Apply the random seed, once, before creating the environment and agent, as they seed their
+    # own random number generators from the global one. (Default: 0)
+    random.seed(int(options.get("random-seed", 0)))
+
     # Create an instance of the environment, using the discovered options.
     environment = environment_class(options = options)
 
@@ -4,11 +4,6 @@
 Defines a base class for AIXI-approximate agents.
 """
 
-from __future__ import division
-from __future__ import print_function
-from __future__ import unicode_literals
-
-import copy
 import random
 
 from pyaixi import util
@@ -52,6 +47,9 @@ class Agent:
             The following options are optional:
              - `learning-period`: the number of cycles the agent should learn for.
                                   Defaults to '0', which is indefinite learning.
+             - `transposition-table-size`: the maximum number of positions to remember the results
+                                           of searches from, for agents that support this.
+                                           Defaults to '0', which remembers none.
         """
 
         # The number of interaction cycles the agent has been alive.
@@ -79,10 +77,29 @@ class Agent:
         # (Called `m_options` in the C++ version.)
         self.options = options
 
+        # The agent's own random number generator, seeded from the global one, so the agent's
+        # random choices are reproducible for a given `random-seed`, and independent of any other
+        # agent's or the environment's.
+        self.rng = random.Random(random.getrandbits(64))
+
+        # The generator's `random()` method, bound once, as it's called at every step of every playout.
+        self.random = self.rng.random
+
         # The total reward earnt by this agent so far.
         # Set initially to 0.
         # (Called `totalReward` in the C++ version.)
         self.total_reward = 0
+
+        # A transposition table, for agents to remember the results of searches from positions
+        # they have already searched, keyed by a hash of the position.
+        # Set initially to be empty.
+        self.transposition_table = {}
+
+        # The maximum number of positions to remember in the transposition table.
+        # Retrieved from the given options under 'transposition-table-size'. Defaults to 0 if not given,
+        # which leaves the table unused.
+        self.transposition_table_size = int(options.get('transposition-table-size', 0))
+        assert 0 <= self.transposition_table_size
     # end def
 
     def average_reward(self):
@@ -105,7 +122,20 @@ class Agent:
             (Called `genRandomAction` in the C++ version.)
         """
 
-        return util.choice(self.environment.valid_actions)
+        # This is called for every step of every playout, so pick the action directly rather than
+        # through `util.choice`, using the same random draw so the result is identical.
+        environment = self.environment
+        return environment.valid_actions[int(self.random() * environment.n_actions)]
+    # end def
+
+    def lookup_transposition(self, key):
+        """ Returns the value remembered for the given position in the transposition table,
+            or None if there isn't one.
+
+            - `key`: the hash of the position to look up.
+        """
+
+        return self.transposition_table.get(key, None)
     # end def
 
     def maximum_action(self):
@@ -172,6 +202,15 @@ class Agent:
         pass
     # end def
 
+    def restore(self, snapshot):
+        """ Restores the environment to the state in the given snapshot, as returned by `snapshot()`.
+
+            - `snapshot`: the snapshot of the environment's state to restore.
+        """
+
+        self.environment.restore(snapshot)
+    # end def
+
     def search(self):
         """ Returns the best action for this agent.
         """
@@ -179,6 +218,35 @@ class Agent:
         return self.maximum_action()
     # end def
 
+    def snapshot(self):
+        """ Returns a snapshot of the state of the environment, so that it can be restored with
+            `restore()` after trying out actions in it, instead of copying the environment.
+        """
+
+        return self.environment.snapshot()
+    # end def
+
+    def store_transposition(self, key, value):
+        """ Remembers the given value for the given position in the transposition table.
+
+            - `key`: the hash of the position.
+            - `value`: the value to remember, such as the result of searching from the position.
+        """
+
+        # Remember nothing if the table is unused.
+        if self.transposition_table_size <= 0:
+            return
+        # end if
+
+        # If the table is full, forget the position that was remembered first.
+        transposition_table = self.transposition_table
+        if (key not in transposition_table) and (len(transposition_table) >= self.transposition_table_size):
+            del transposition_table[next(iter(transposition_table))]
+        # end if
+
+        transposition_table[key] = value
+    # end def
+
     def reset(self):
         """ Resets the agent.
 
@@ -189,5 +257,8 @@ class Agent:
         self.age = 0
         self.total_reward = 0.0
         self.last_update = action_update
+
+        # Forget any remembered search results.
+        self.transposition_table = {}
     # end def
 # end class
\ No newline at end of file
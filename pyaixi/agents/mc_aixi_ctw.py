@@ -4,30 +4,77 @@
 Defines a class for the MC-AIXI-CTW agent.
 """
 
-from __future__ import division
-from __future__ import print_function
-from __future__ import unicode_literals
-
-import copy
+import concurrent.futures
 import os
-import random
-import sys
 
-# Insert the package's parent directory into the system search path, so that this package can be
-# imported when the aixi.py script is run directly from a release archive.
-PROJECT_ROOT = os.path.realpath(os.path.join(os.pardir, os.pardir))
-sys.path.insert(0, PROJECT_ROOT)
+from pyaixi import agent, util
+
+from pyaixi.agent import action_update, percept_update
+from pyaixi.prediction.ctw_context_tree import CTWContextTree
+from pyaixi.search.monte_carlo_search_tree import MonteCarloSearchNode, chance_node, decision_node
+
+# A worker process's own copy of the agent that started it, when searching in parallel.
+# Installed once, when the worker starts, by `initialize_search_worker`, then kept up to date with
+# the agent's history by `sample_search_tree`. (See `MC_AIXI_CTW_Agent.sample_in_parallel`.)
+worker_agent = None
+
+def initialize_search_worker(agent):
+    """ Installs the given copy of an agent as this worker process's own, to search from.
 
-# Ensure xrange is defined on Python 3.
-from six.moves import xrange
+        - `agent`: the (copy of the) agent to search from.
+    """
+
+    global worker_agent
+    worker_agent = agent
+# end def
 
-from pyaixi import agent, prediction, search, util
+def sample_search_tree(history_start, history, simulations, seed):
+    """ Returns a tuple of this worker process's ID, the length of its agent's history, and the
+        visit counts and mean rewards of the actions at the root of a new search tree, built by
+        sampling the given number of times from its agent, as a dictionary of `(visits, mean)`
+        pairs indexed by action.
 
-from pyaixi.agent import update_enum, action_update, percept_update
-from pyaixi.prediction import ctw_context_tree
-from pyaixi.search import monte_carlo_search_tree
-from pyaixi.search.monte_carlo_search_tree import nodetype_enum, chance_node, decision_node
+        This is run in a worker process, on its own copy of the agent, when searching in parallel.
+        Before sampling, the copy is brought up to date by updating it with the actions and
+        percepts in the given history it hasn't seen yet.
+
+        - `history_start`: the position in the agent's history the given history starts from.
+        - `history`: the agent's history from `history_start` on.
+        - `simulations`: the number of times to sample.
+        - `seed`: the seed for the agent's random number generator, so each worker samples differently.
+    """
 
+    agent = worker_agent
+
+    # Update the copy with the actions and percepts it hasn't seen yet, in the order they happened.
+    action_bits = agent.environment.action_bits()
+    percept_bits = agent.environment.percept_bits()
+    position = agent.history_size() - history_start
+    while position < len(history):
+        if agent.last_update == percept_update:
+            agent.model_update_action(agent.decode_action(list(history[position:(position + action_bits)])))
+            position += action_bits
+        else:
+            observation, reward = agent.decode_percept(list(history[position:(position + percept_bits)]))
+            agent.model_update_percept(observation, reward)
+            position += percept_bits
+        # end if
+    # end while
+
+    # Reseed the agent's generator, which is also the one its context tree samples with.
+    agent.rng.seed(seed)
+
+    # Sample from the agent, reverting after each sample, as `MC_AIXI_CTW_Agent.search` does.
+    undo_instance = MC_AIXI_CTW_Undo(agent)
+    search_tree = MonteCarloSearchNode(decision_node)
+    for i in range(0, simulations):
+        search_tree.sample(agent, agent.horizon)
+        agent.model_revert(undo_instance)
+    # end for
+
+    children = dict([(action, (child.visits, child.mean)) for (action, child) in search_tree.children.items()])
+    return (os.getpid(), agent.history_size(), children)
+# end def
 
 class MC_AIXI_CTW_Undo:
     """ A class to save details from a MC-AIXI-CTW agent to restore state later.
@@ -117,6 +164,12 @@ class MC_AIXI_CTW_Agent(agent.Agent):
             The following options are optional:
              - `learning-period`: the number of cycles the agent should learn for.
                                   Defaults to '0', which is indefinite learning.
+             - `reuse-search-tree`: whether to continue each search from the part of the previous
+                                    search's tree that follows the action taken and observation
+                                    received since (when searching in this process).
+                                    Defaults to '0', which starts each search from a new tree.
+             - `search-workers`: the number of worker processes to run the simulations in.
+                                 Defaults to '1', which runs them all in this process.
         """
 
         # Set up the base agent options, which handles getting and setting the learning period, amongst other basic values.
@@ -132,7 +185,7 @@ class MC_AIXI_CTW_Agent(agent.Agent):
         # (CTW) Context tree representing the agent's model of the environment.
         # Created for this instance.
         # (Called `m_ct` in the C++ version.)
-        self.context_tree = ctw_context_tree.CTWContextTree(self.depth)
+        self.context_tree = CTWContextTree(self.depth, rng = self.rng)
 
         # The length of the agent's planning horizon.
         # Retrieved from the given options under 'agent-horizon'. Mandatory.
@@ -148,9 +201,46 @@ class MC_AIXI_CTW_Agent(agent.Agent):
                "The required 'mc-simulations' Monte Carlo simulations count option is missing from the given options."
         self.mc_simulations = int(options['mc-simulations'])
 
+        # The number of worker processes to share the simulations between when choosing new actions.
+        # Retrieved from the given options under 'search-workers'. Defaults to 1 if not given.
+        self.search_workers = int(options.get('search-workers', 1))
+        assert self.search_workers >= 1, "The given number of search workers must be at least 1."
+
+        # The pool of worker processes searching in parallel, each with its own copy of this agent,
+        # and the length of the history each worker's copy has been updated with, indexed by its
+        # process ID. (Created by `sample_in_parallel` when first needed, and cleared by `reset`.)
+        self.search_pool = None
+        self.search_pool_history_sizes = {}
+
+        # The length of the history when the pool was created, which its workers' copies start from.
+        self.search_pool_history_size = 0
+
+        # Whether to keep the search tree between searches, to continue the next search from the
+        # part of it that follows the action taken and observation received in the meantime.
+        # Retrieved from the given options under 'reuse-search-tree'. Defaults to 0 (no) if not given.
+        self.reuse_search_tree = bool(int(options.get('reuse-search-tree', 0)))
+
+        # The tree from the last search, if it's being kept for reuse, and the length of the
+        # history when it was searched from. (Cleared by `reset`.)
+        self.search_tree = None
+        self.search_tree_history_size = 0
+
         self.reset()
     # end def
 
+    def __getstate__(self):
+        """ Returns the state of the agent to pickle, e.g. when sending it to a worker process.
+
+            This is the agent's attributes, except for its pool of worker processes, which can't
+            be shared with another process.
+        """
+
+        state = dict(self.__dict__)
+        state['search_pool'] = None
+        state['search_pool_history_sizes'] = {}
+        return state
+    # end def
+
     def decode_action(self, symbol_list):
         """ Returns the action decoded from the beginning of the given list of symbols.
 
@@ -270,7 +360,7 @@ class MC_AIXI_CTW_Agent(agent.Agent):
         percept_symbols = self.context_tree.generate_random_symbols(self.environment.percept_bits())
 
         # Decode and return the percept symbols into the desired observation and reward.
-        return self.decodePercept(percept_symbols)
+        return self.decode_percept(percept_symbols)
     # end def
 
     def generate_percept_and_update(self):
@@ -303,7 +393,7 @@ class MC_AIXI_CTW_Agent(agent.Agent):
             (Called `getPredictedActionProb` in the C++ version.)
         """
         # Do some sanity checks.
-        assert self.environment.is_valid_action(action), "The given action is invalid."
+        assert action in self.environment.valid_actions_set, "The given action is invalid."
         assert self.last_update == percept_update, "Can only make predictions after a percept update."
 
         # Encode the action first.
@@ -376,7 +466,7 @@ class MC_AIXI_CTW_Agent(agent.Agent):
         """
 
         # The last update must have been a percept, else this action update is invalid.
-        assert self.environment.is_valid_action(action), "Invalid action given."
+        assert action in self.environment.valid_actions_set, "Invalid action given."
         assert self.last_update == percept_update, "Can only perform an action update after a percept update."
 
         # Update the agent's internal model of the world after performing an action.
@@ -458,7 +548,7 @@ class MC_AIXI_CTW_Agent(agent.Agent):
         total_reward = 0.0
 
         # Perform `horizon` number of randomly chosen actions.
-        for i in xrange(0, horizon):
+        for i in range(0, horizon):
             # Execute an action chosen uniformly at random.
             action = self.generate_random_action()
             self.model_update_action(action)
@@ -474,17 +564,125 @@ class MC_AIXI_CTW_Agent(agent.Agent):
         return total_reward
     # end def
 
+    def previous_search_subtree(self):
+        """ Returns the node of the previous search's tree reached by the action taken and the
+            observation received since that search, to continue searching from, or None if there
+            isn't one (or the previous search wasn't exactly one cycle ago).
+        """
+
+        # Forget the previous tree, whether or not part of it is reused.
+        search_tree = self.search_tree
+        self.search_tree = None
+        if search_tree is None:
+            return None
+        # end if
+
+        # Check that there's been exactly one action and percept since the previous search.
+        action_bits = self.environment.action_bits()
+        percept_bits = self.environment.percept_bits()
+        if self.history_size() != (self.search_tree_history_size + action_bits + percept_bits):
+            return None
+        # end if
+
+        # Decode the action and percept from the end of the history.
+        symbol_list = list(self.context_tree.history[-(action_bits + percept_bits):])
+        action = self.decode_action(symbol_list[:action_bits])
+        observation, reward = self.decode_percept(symbol_list[action_bits:])
+
+        # Find the decision node for this action and observation, if the previous search reached it.
+        action_child = search_tree.children.get(action, None)
+        if action_child is None:
+            return None
+        # end if
+
+        return action_child.children.get(observation, None)
+    # end def
+
     def reset(self):
         """ Resets the agent and clears the context tree.
         """
 
-        # Reset the context tree.
+        # Reset the context tree, and forget any search tree kept for reuse.
         self.context_tree.clear()
+        self.search_tree = None
+
+        # Stop any worker processes, as their copies of the agent are now out of date.
+        if self.search_pool is not None:
+            self.search_pool.shutdown()
+            self.search_pool = None
+        # end if
 
         # Reset the basic agent details.
         agent.Agent.reset(self)
     # end def
 
+    def sample_in_parallel(self):
+        """ Returns the root of a search tree for the agent's current state, combining independent
+            searches run in `search_workers` worker processes. (Root parallelisation.)
+
+            Each worker samples its share of `mc_simulations` from its own copy of the agent, with
+            its own random seed, and returns the visit counts and mean rewards of its root's
+            children. These are combined into the children of the returned root: their visits
+            summed, and their means weighted by their visits.
+
+            Each worker is given its copy of the agent once, when the pool of workers is created.
+            After that, each search sends only the part of the history that the least up to date
+            worker hasn't seen, which the workers update their copies with before sampling.
+        """
+
+        workers = self.search_workers
+
+        # Start the workers, if they haven't been already, each with a copy of this agent.
+        # (Which worker runs which share of the simulations is up to the pool, so each worker's
+        # progress through the history is tracked separately, once it's known.)
+        if self.search_pool is None:
+            self.search_pool_history_size = self.history_size()
+            self.search_pool_history_sizes = {}
+            self.search_pool = concurrent.futures.ProcessPoolExecutor(max_workers = workers,
+                                                                      initializer = initialize_search_worker,
+                                                                      initargs = (self,))
+        # end if
+
+        # Send the history from where the least up to date worker has got to.
+        # (Workers that haven't run a search yet are still where the pool was created.)
+        history_sizes = list(self.search_pool_history_sizes.values())
+        if len(history_sizes) < workers:
+            history_sizes.append(self.search_pool_history_size)
+        # end if
+        history_start = min(history_sizes)
+        history = bytes(self.context_tree.history[history_start:])
+
+        # Share the simulations out as evenly as possible, and pick a seed for each worker.
+        simulations = [(self.mc_simulations // workers) + (1 if i < (self.mc_simulations % workers) else 0)
+                       for i in range(0, workers)]
+        seeds = [self.rng.getrandbits(64) for i in range(0, workers)]
+
+        # Run the searches, each on a worker's copy of this agent.
+        results = self.search_pool.map(sample_search_tree, [history_start] * workers, [history] * workers,
+                                       simulations, seeds)
+
+        # Combine the results into a single search tree.
+        search_tree = MonteCarloSearchNode(decision_node)
+        search_tree.visits = self.mc_simulations
+        for (worker, history_size, children) in results:
+            self.search_pool_history_sizes[worker] = history_size
+            for (action, (visits, mean)) in children.items():
+                child = search_tree.children.get(action, None)
+                if child is None:
+                    child = search_tree.children[action] = MonteCarloSearchNode(chance_node)
+                # end if
+
+                total_visits = child.visits + visits
+                if total_visits > 0:
+                    child.mean = ((child.visits * child.mean) + (visits * mean)) / float(total_visits)
+                # end if
+                child.visits = total_visits
+            # end for
+        # end for
+
+        return search_tree
+    # end def
+
     def search(self):
         """ Returns the best action for this agent as determined using the Monte-Carlo Tree Search
             (predictive UCT).
@@ -492,20 +690,49 @@ class MC_AIXI_CTW_Agent(agent.Agent):
 
         # Use rhoUCT to search for the next action.
 
-        # Save the agent's current state.
-        undo_instance = MC_AIXI_CTW_Undo(self)
+        # Once the agent has stopped learning, its model no longer changes, so the result of a
+        # search depends only on the context the model predicts from: the most recent `self.depth`
+        # symbols of history. If asked to, and we've already searched from this context, reuse that result.
+        # (Results aren't remembered while learning, as the model they came from goes out of date.)
+        transposition_key = None
+        if (self.transposition_table_size > 0) and (self.learning_period > 0) and (self.age > self.learning_period):
+            # (A context tree of depth 0 predicts from no context at all, so the key is empty.)
+            history = self.context_tree.history
+            transposition_key = tuple(history[max(len(history) - self.depth, 0):])
+            best_action = self.lookup_transposition(transposition_key)
+            if best_action is not None:
+                return best_action
+            # end if
+        # end if
+
+        if self.search_workers > 1:
+            # Share the sampling between worker processes.
+            search_tree = self.sample_in_parallel()
+        else:
+            # Save the agent's current state.
+            undo_instance = MC_AIXI_CTW_Undo(self)
+
+            # Create a new search tree, unless continuing from part of the previous one.
+            search_tree = self.previous_search_subtree() if self.reuse_search_tree else None
+            if search_tree is None:
+                search_tree = MonteCarloSearchNode(decision_node)
+            # end if
 
-        # Create a new search tree.
-        search_tree = monte_carlo_search_tree.MonteCarloSearchNode(decision_node)
+            # Sample `self.mc_simulations` number of times from the current agent, reverting after each sample.
+            for i in range(0, self.mc_simulations):
+                # Sample from the clone, up to the current horizon
+                search_tree.sample(self, self.horizon)
 
-        # Sample `self.mc_simulations` number of times from the current agent, reverting after each sample.
-        for i in xrange(0, self.mc_simulations):
-            # Sample from the clone, up to the current horizon
-            search_tree.sample(self, self.horizon)
+                # Revert the sampling.
+                self.model_revert(undo_instance)
+            # end for
 
-            # Revert the sampling.
-            self.model_revert(undo_instance)
-        # end for
+            # Keep the tree, to continue the next search from, if asked to.
+            if self.reuse_search_tree:
+                self.search_tree = search_tree
+                self.search_tree_history_size = self.history_size()
+            # end if
+        # end if
 
         # Determine the best action using the tree constructed during sampling,
         # by choosing the action branch from this tree that provides the best expected reward.
@@ -520,7 +747,7 @@ class MC_AIXI_CTW_Agent(agent.Agent):
 
             # Get the mean chance of this action, plus a small fudge factor to
             # encourage occasional exploration of other paths.
-            mean = search_tree.children[action].mean + (random.random() * 0.0001)
+            mean = search_tree.children[action].mean + (self.random() * 0.0001)
 
             # Is the mean of this action better than that we've seen so far?
             if mean > best_mean:
@@ -530,6 +757,11 @@ class MC_AIXI_CTW_Agent(agent.Agent):
             # end def
         # end for
 
+        # Remember the best action for this context, if we're no longer learning.
+        if transposition_key is not None:
+            self.store_transposition(transposition_key, best_action)
+        # end if
+
         # Return the best action discovered.
         return best_action
     # end def
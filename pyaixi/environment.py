@@ -4,14 +4,104 @@
 Defines an environment for AIXI agents.
 """
 
-from __future__ import division
-from __future__ import print_function
-from __future__ import unicode_literals
+import random
 
-import sys
 from pyaixi import util
 
-class Environment:
+def compact_values(values):
+    """ Returns the given collection of integer values as a range, if they are consecutive and
+        in increasing order, or as they are otherwise.
+        A range doesn't need to store its values, and checks for membership in constant time.
+
+        - `values`: the collection of values.
+    """
+
+    if isinstance(values, range) or len(values) == 0:
+        return values
+    # end if
+
+    first = values[0]
+    if list(values) == list(range(first, first + len(values))):
+        return range(first, first + len(values))
+    # end if
+
+    return values
+# end def
+
+def maximum_bits_required(values):
+    """ Returns the maximum number of bits required to represent any of the given values.
+
+        - `values`: the collection of values.
+    """
+
+    # Larger values never need fewer bits, so this is the number of bits the largest value needs.
+    # (A range's largest value is its last, so there's no need to look through it.)
+    if len(values) == 0:
+        return 0
+    # end if
+
+    return util.bits_required(values[-1] if isinstance(values, range) else max(values))
+# end def
+
+def membership_set(values):
+    """ Returns a collection with the same members as the given collection of values, which can
+        check for membership in constant time. (Ranges already can, so are returned as they are.)
+
+        - `values`: the collection of values.
+    """
+
+    return values if isinstance(values, range) else frozenset(values)
+# end def
+
+# The compacted valid values and membership sets handed out by `share_values`, keyed by the values
+# as a range or tuple, so that environments with the same valid values share one copy of each.
+shared_values = {}
+
+def share_values(values):
+    """ Returns a tuple of the given collection of values in compact form, as a range or tuple,
+        and a collection to check for membership of them, as returned by `membership_set`.
+        Environments given equal values get the same shared, immutable objects back.
+
+        - `values`: the collection of values.
+    """
+
+    values = compact_values(values)
+    key = values if isinstance(values, range) else tuple(values)
+
+    shared = shared_values.get(key)
+    if shared is None:
+        shared = shared_values[key] = (key, membership_set(key))
+    # end if
+
+    return shared
+# end def
+
+# The names of the slots declared by each environment class and the classes it inherits from,
+# worked out when first needed by `slot_names`, keyed by class.
+class_slot_names = {}
+
+def slot_names(cls):
+    """ Returns a tuple of the names of the slots declared by the given class and the classes
+        it inherits from, other than any for the instance dictionary or weak references.
+
+        - `cls`: the class.
+    """
+
+    names = class_slot_names.get(cls)
+    if names is None:
+        names = []
+        for base in cls.__mro__:
+            slots = getattr(base, '__slots__', ())
+            slots = [slots] if isinstance(slots, str) else slots
+            names.extend([name for name in slots if name not in ('__dict__', '__weakref__')])
+        # end for
+        names = class_slot_names[cls] = tuple(names)
+    # end if
+
+    return names
+# end def
+
+class Environment(object):
     """ Base class for the various agent environments.
 
         Each individual environment should inherit from this class and implement the appropriate methods.
@@ -35,6 +125,21 @@ class Environment:
         and the program exits. Otherwise the interaction continues indefinitely.
     """
 
+    # Class attributes.
+
+    # Store the base environment's attributes in slots rather than the instance dictionary,
+    # so that reading them doesn't need a dictionary lookup.
+    # (Inheriting classes should declare slots for all of their own attributes too, as an empty
+    # tuple if they have none, or else they'll be given an instance dictionary for them.)
+    __slots__ = ('action', 'cached_action_bits', 'cached_maximum_action', 'cached_maximum_observation',
+                 'cached_maximum_reward', 'cached_minimum_action', 'cached_minimum_observation',
+                 'cached_minimum_reward', 'cached_observation_bits', 'cached_percept_bits', 'cached_reward_bits',
+                 'is_finished', 'n_actions', 'observation', 'options', 'random', 'reward', 'reward_range', 'rng',
+                 'valid_actions', 'valid_actions_set', 'valid_observations', 'valid_observations_set',
+                 'valid_rewards', 'valid_rewards_set')
+
+    # Instance methods.
+
     def __init__(self, options = {}):
         """ Construct an agent environment.
         """
@@ -54,6 +159,14 @@ class Environment:
         # Store the given options.
         self.options = options
 
+        # Give the environment its own random number generator, seeded from the global one, so
+        # the environment's random choices are reproducible for a given `random-seed`, and don't
+        # disturb (or get disturbed by) the agent's use of the global generator.
+        self.rng = random.Random(random.getrandbits(64))
+
+        # The generator's `random()` method, bound once, as environments call it at every step.
+        self.random = self.rng.random
+
         # Set the current reward to null/None.
         # (Called `m_reward` in the C++ version.)
         self.reward = None
@@ -66,64 +179,116 @@ class Environment:
 
         # Define the acceptable reward values.
         self.valid_rewards = []
+
+        # Work out the values derived from the acceptable values.
+        # (Inheriting classes call this again, once they've set their own acceptable values.)
+        self.configure_valid_values()
+    # end def
+
+    def __getstate__(self):
+        """ Returns the state of the environment to pickle, e.g. when sending it to a worker process.
+
+            This is a dictionary of all of the environment's attributes, as returned by the base
+            `Environment.snapshot()`, including its random number generator.
+            (Inheriting classes' own `snapshot()` methods may leave attributes out, so aren't used.)
+        """
+
+        return Environment.snapshot(self)
+    # end def
+
+    def __setstate__(self, state):
+        """ Sets the state of an unpickled environment from the given state, as returned by `__getstate__()`.
+
+            The attributes are restored directly, without constructing the environment afresh,
+            so no tables are rebuilt, and no random numbers are drawn from the global generator.
+
+            - `state`: the pickled state to restore.
+        """
+
+        Environment.restore(self, state)
     # end def
 
-    def __unicode__(self):
+    def __str__(self):
         """ Returns a string representation of this environment instance.
         """
         return "action = " + str(self.action) + ", observation = " + \
                str(self.observation) + ", reward = " + str(self.reward)
     # end def
 
-    # Make a compatible string function for the current Python version.
-    if sys.version_info[0] >= 3:
-        # For Python 3.
-        def __str__(self):
-            return self.__unicode__()
-        # end def
-    else:
-        # For Python 2.
-        def __str__(self):
-            return self.__unicode__().encode('utf8')
-        # end def
-    # end def
-
     def action_bits(self):
         """ Returns the maximum number of bits required to represent an action.
             (Called `actionBits` in the C++ version.)
         """
 
-        # Find the largest sized observation.
-        maximum_bits = 0
-        for action in self.valid_actions:
-            bits_for_this_action = util.bits_required(action)
-            if bits_for_this_action > maximum_bits:
-                maximum_bits = bits_for_this_action
-            # end if
-        # end for
+        # This is worked out by `configure_valid_values()`.
+        return self.cached_action_bits
+    # end def
+
+    def configure_valid_values(self):
+        """ Works out the values derived from the acceptable actions, observations and rewards,
+            in `valid_actions`, `valid_observations` and `valid_rewards`.
+
+            Must be called by inheriting classes after setting (or changing) any of these.
+
+            The acceptable values are replaced by a compact copy: a range if they're consecutive,
+            or else a tuple, shared with any other environments with the same values.
+            This also sets:
+             - `valid_actions_set`, `valid_observations_set` and `valid_rewards_set`, used to check
+               for valid actions, observations and rewards.
+             - `cached_action_bits`, `cached_observation_bits`, `cached_reward_bits` and
+               `cached_percept_bits`, the number of bits required to represent each.
+             - `cached_maximum_action`, `cached_minimum_action` and so on, the largest and smallest
+               of each, or null/None if there are none.
+             - `n_actions`, the number of actions.
+             - `reward_range`, a tuple of the smallest and largest rewards, for use in the UCB
+               formula during search, or of null/None if there are none.
+        """
 
-        return maximum_bits
+        (self.valid_actions, self.valid_actions_set) = share_values(self.valid_actions)
+        (self.valid_observations, self.valid_observations_set) = share_values(self.valid_observations)
+        (self.valid_rewards, self.valid_rewards_set) = share_values(self.valid_rewards)
+
+        valid_actions = self.valid_actions
+        valid_observations = self.valid_observations
+        valid_rewards = self.valid_rewards
+
+        self.cached_action_bits = maximum_bits_required(valid_actions)
+        self.cached_observation_bits = maximum_bits_required(valid_observations)
+        self.cached_reward_bits = maximum_bits_required(valid_rewards)
+        self.cached_percept_bits = self.cached_observation_bits + self.cached_reward_bits
+
+        # The largest of each is the last in the list of valid values, and the smallest the first.
+        # Else, they're null/None.
+        self.cached_maximum_action = valid_actions[-1] if len(valid_actions) > 0 else None
+        self.cached_minimum_action = valid_actions[0] if len(valid_actions) > 0 else None
+        self.cached_maximum_observation = valid_observations[-1] if len(valid_observations) > 0 else None
+        self.cached_minimum_observation = valid_observations[0] if len(valid_observations) > 0 else None
+        self.cached_maximum_reward = valid_rewards[-1] if len(valid_rewards) > 0 else None
+        self.cached_minimum_reward = valid_rewards[0] if len(valid_rewards) > 0 else None
+
+        self.n_actions = len(valid_actions)
+        self.reward_range = (self.cached_minimum_reward, self.cached_maximum_reward)
     # end def
 
     def is_valid_action(self, action):
         """ Returns whether the given action is valid.
             (Called `isValidAction` in the C++ version.)
         """
-        return action in self.valid_actions
+        return action in self.valid_actions_set
     # end def
 
     def is_valid_observation(self, observation):
         """ Returns whether the given observation is valid.
             (Called `isValidObservation` in the C++ version.)
         """
-        return observation in self.valid_observations
+        return observation in self.valid_observations_set
     # end def
 
     def is_valid_reward(self, reward):
         """ Returns whether the given reward is valid.
             (Called `isValidReward` in the C++ version.)
         """
-        return reward in self.valid_rewards
+        return reward in self.valid_rewards_set
     # end def
 
     def maximum_action(self):
@@ -131,9 +296,8 @@ class Environment:
             (Called `maxAction` in the C++ version.)
         """
 
-        # The largest action is the last in the list of valid actions.
-        # Else, it's null/None.
-        return self.valid_actions[-1] if len(self.valid_actions) > 0 else None
+        # This is worked out by `configure_valid_values()`.
+        return self.cached_maximum_action
     # end def
 
     def maximum_observation(self):
@@ -141,9 +305,8 @@ class Environment:
             (Called `maxObservation` in the C++ version.)
         """
 
-        # The largest observation is the last in the list of valid observations.
-        # Else, it's null/None.
-        return self.valid_observations[-1] if len(self.valid_observations) > 0 else None
+        # This is worked out by `configure_valid_values()`.
+        return self.cached_maximum_observation
     # end def
 
     def maximum_reward(self):
@@ -151,9 +314,8 @@ class Environment:
             (Called `maxReward` in the C++ version.)
         """
 
-        # The largest reward is the last in the list of valid rewards.
-        # Else, it's null/None.
-        return self.valid_rewards[-1] if len(self.valid_rewards) > 0 else None
+        # This is worked out by `configure_valid_values()`.
+        return self.cached_maximum_reward
     # end def
 
     def minimum_action(self):
@@ -161,9 +323,8 @@ class Environment:
             (Called `minAction` in the C++ version.)
         """
 
-        # The smallest action is the first in the list of valid actions.
-        # Else, it's null/None.
-        return self.valid_actions[1] if len(self.valid_actions) > 0 else None
+        # This is worked out by `configure_valid_values()`.
+        return self.cached_minimum_action
     # end def
 
     def minimum_observation(self):
@@ -171,9 +332,8 @@ class Environment:
             (Called `minObservation` in the C++ version.)
         """
 
-        # The smallest observation is the first in the list of valid observations.
-        # Else, it's null/None.
-        return self.valid_observations[1] if len(self.valid_observations) > 0 else None
+        # This is worked out by `configure_valid_values()`.
+        return self.cached_minimum_observation
     # end def
 
     def minimum_reward(self):
@@ -181,9 +341,8 @@ class Environment:
             (Called `minReward` in the C++ version.)
         """
 
-        # The smallest reward is the first in the list of valid rewards.
-        # Else, it's null/None.
-        return self.valid_rewards[1] if len(self.valid_rewards) > 0 else None
+        # This is worked out by `configure_valid_values()`.
+        return self.cached_minimum_reward
     # end def
 
     def observation_bits(self):
@@ -191,16 +350,8 @@ class Environment:
             (Called `observationBits` in the C++ version)
         """
 
-        # Find the largest sized observation.
-        maximum_bits = 0
-        for observation in self.valid_observations:
-            bits_for_this_observation = util.bits_required(observation)
-            if bits_for_this_observation > maximum_bits:
-                maximum_bits = bits_for_this_observation
-            # end if
-        # end for
-
-        return maximum_bits
+        # This is worked out by `configure_valid_values()`.
+        return self.cached_observation_bits
     # end def
 
     def percept_bits(self):
@@ -208,7 +359,8 @@ class Environment:
             (Called `perceptBits` in the C++ version.)
         """
 
-        return self.observation_bits() + self.reward_bits()
+        # This is worked out by `configure_valid_values()`.
+        return self.cached_percept_bits
     # end def
 
     def perform_action(self, action):
@@ -219,26 +371,107 @@ class Environment:
         pass
     # end def
 
+    def perform_actions(self, actions):
+        """ Performs each of the given actions in turn, and returns a list of the resulting
+            percepts, as returned by `perform_action()`.
+
+            - `actions`: the sequence of actions to perform.
+
+            NOTE: this method may be overriden by inheriting classes that can calculate the percepts
+                  for a batch of actions more cheaply than one at a time.
+        """
+
+        perform_action = self.perform_action
+        return [perform_action(action) for action in actions]
+    # end def
+
     def print(self):
         """ String representation convenience method from the C++ version.
         """
         return str(self)
     # end def
 
+    def restore(self, snapshot):
+        """ Restores the state of the environment from the given snapshot, as returned by `snapshot()`.
+
+            - `snapshot`: the snapshot of the state to restore.
+
+            NOTE: this method may be overriden by inheriting classes, together with `snapshot()`.
+        """
+
+        for (name, value) in snapshot.items():
+            setattr(self, name, value)
+        # end for
+    # end def
+
     def reward_bits(self):
         """ Returns the maximum number of bits required to represent a reward.
             (Called `rewardBits` in the C++ version)
         """
 
-        # Find the largest sized reward.
-        maximum_bits = 0
-        for reward in self.valid_rewards:
-            bits_for_this_reward = util.bits_required(reward)
-            if bits_for_this_reward > maximum_bits:
-                maximum_bits = bits_for_this_reward
+        # This is worked out by `configure_valid_values()`.
+        return self.cached_reward_bits
+    # end def
+
+    def snapshot(self):
+        """ Returns a snapshot of the state of the environment, which can later be given to
+            `restore()` to return the environment to this state. (e.g. before and after
+            trying out a sequence of actions.)
+
+            By default, this is a dictionary containing a shallow copy of the environment's attributes.
+
+            NOTE: this method may be overriden by inheriting classes, together with `restore()`,
+                  to return a cheaper snapshot, such as a tuple of the attributes that can change.
+        """
+
+        # Copy the attributes in the slots of each class that have been set.
+        snapshot = {}
+        for name in slot_names(type(self)):
+            if hasattr(self, name):
+                snapshot[name] = getattr(self, name)
             # end if
         # end for
 
-        return maximum_bits
+        # Copy any attributes of inheriting classes that don't declare slots, which are kept in
+        # the instance dictionary instead.
+        snapshot.update(getattr(self, '__dict__', {}))
+
+        return snapshot
+    # end def
+
+    def step_batch(self, actions, states):
+        """ Performs one action from each of a batch of environment states, such as those of several
+            independent rollouts, and returns a tuple of the list of resulting percepts, and the list
+            of resulting states.
+
+            The environment itself is left in the state it was in before the call, including its
+            random number generator, so the call doesn't change the percepts it goes on to give.
+
+            - `actions`: the sequence of actions to perform, one for each state.
+            - `states`: the sequence of states to perform the actions from, as returned by `snapshot()`.
+
+            NOTE: this method may be overriden by inheriting classes that can step many states at once.
+        """
+
+        assert len(actions) == len(states), "There must be one action for each state."
+
+        # Save the current state, to return to afterwards.
+        # (Snapshots only refer to the random number generator, if they include it at all, so save
+        # the generator's state too, as performing the actions moves it on.)
+        current_state = self.snapshot()
+        rng_state = self.rng.getstate()
+
+        percepts = []
+        new_states = []
+        for (action, state) in zip(actions, states):
+            self.restore(state)
+            percepts.append(self.perform_action(action))
+            new_states.append(self.snapshot())
+        # end for
+
+        self.restore(current_state)
+        self.rng.setstate(rng_state)
+
+        return (percepts, new_states)
     # end def
 # end class
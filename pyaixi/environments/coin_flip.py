@@ -4,19 +4,6 @@
 Defines an environment for a biased coin flip.
 """
 
-from __future__ import division
-from __future__ import print_function
-from __future__ import unicode_literals
-
-import os
-import random
-import sys
-
-# Insert the package's parent directory into the system search path, so that this package can be
-# imported when the aixi.py script is run directly from a release archive.
-PROJECT_ROOT = os.path.realpath(os.path.join(os.pardir, os.pardir))
-sys.path.insert(0, PROJECT_ROOT)
-
 from pyaixi import environment, util
 
 # Define a enumeration to represent coin flip actions, which is a prediction of the coin landing on
@@ -40,6 +27,14 @@ oTails = coin_flip_observation_enum.oTails
 rLose = coin_flip_reward_enum.rLose
 rWin = coin_flip_reward_enum.rWin
 
+# The coin flip is worked out arithmetically, which relies on tails/heads and losing/winning being 0/1.
+assert (aTails, aHeads) == (oTails, oHeads) == (rLose, rWin) == (0, 1)
+
+# The acceptable action, observation and reward values, shared by every instance.
+VALID_ACTIONS      = tuple(coin_flip_action_enum.keys())
+VALID_OBSERVATIONS = tuple(coin_flip_observation_enum.keys())
+VALID_REWARDS      = tuple(coin_flip_reward_enum.keys())
+
 class CoinFlip(environment.Environment):
     """ A biased coin is flipped and the agent is tasked with predicting how it
         will land. The agent receives a reward of `rWin` for a correct
@@ -67,6 +62,10 @@ class CoinFlip(environment.Environment):
     # Set the default probability for the biased coin, when none is supplied from the options.
     default_probability = 0.7
 
+    # Class attributes.
+
+    __slots__ = ('probability',)
+
     # Instance methods.
 
     def __init__(self, options = {}):
@@ -82,13 +81,16 @@ class CoinFlip(environment.Environment):
         environment.Environment.__init__(self, options = options)
 
         # Define the acceptable action values.
-        self.valid_actions = list(coin_flip_action_enum.keys())
+        self.valid_actions = VALID_ACTIONS
 
         # Define the acceptable observation values.
-        self.valid_observations = list(coin_flip_observation_enum.keys())
+        self.valid_observations = VALID_OBSERVATIONS
 
         # Define the acceptable reward values.
-        self.valid_rewards = list(coin_flip_reward_enum.keys())
+        self.valid_rewards = VALID_REWARDS
+
+        # Work out the values derived from the acceptable values.
+        self.configure_valid_values()
 
         # Determine the probability of the coin landing on heads.
         if 'coin-flip-p' not in options:
@@ -100,7 +102,7 @@ class CoinFlip(environment.Environment):
         assert 0.0 <= self.probability and self.probability <= 1.0
 
         # Set an initial percept.
-        self.observation = oHeads if random.random() < self.probability else oTails
+        self.observation = oHeads if self.random() < self.probability else oTails
         self.reward = 0
     # end def
 
@@ -109,19 +111,15 @@ class CoinFlip(environment.Environment):
             (Called `performAction` in the C++ version.)
         """
 
-        assert self.is_valid_action(action)
+        assert action in self.valid_actions_set, "Invalid action given."
 
         # Save the action.
         self.action = action
 
         # Flip the coin, set observation and reward appropriately.
-        if (random.random() < self.probability):
-            observation = oHeads
-            reward = rWin if action == oHeads else rLose
-        else:
-            observation = oTails
-            reward = rWin if action == oTails else rLose
-        # end if
+        # (The observation is 1 for heads, and the reward 1 for a correct prediction.)
+        observation = int(self.random() < self.probability)
+        reward = int(action == observation)
 
         # Store the observation and reward in the environment.
         self.observation = observation
@@ -130,6 +128,37 @@ class CoinFlip(environment.Environment):
         return (observation, reward)
     # end def
 
+    def perform_actions(self, actions):
+        """ Performs each of the given actions in turn, and returns a list of the resulting percepts.
+
+            Flips the coins for the whole batch at once, giving the same results as calling
+            `perform_action()` for each action in turn.
+
+            - `actions`: the sequence of actions to perform.
+        """
+
+        actions = list(actions)
+        valid_actions_set = self.valid_actions_set
+        assert all(action in valid_actions_set for action in actions), "Invalid action given."
+
+        # Flip a coin for each action.
+        random = self.random
+        probability = self.probability
+        observations = [int(random() < probability) for action in actions]
+
+        # Each prediction wins if it matches how its coin landed.
+        percepts = [(observation, int(action == observation))
+                    for (action, observation) in zip(actions, observations)]
+
+        # Store the last action, observation and reward in the environment.
+        if len(percepts) > 0:
+            self.action = actions[-1]
+            (self.observation, self.reward) = percepts[-1]
+        # end if
+
+        return percepts
+    # end def
+
     def print(self):
         """ Returns a string indicating the status of the environment.
         """
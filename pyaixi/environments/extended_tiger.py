@@ -5,19 +5,6 @@ Defines an environment for an extended version of an agent interacting with an e
 where there's a tiger and a pot of gold hidden separately, behind two closed doors.
 """
 
-from __future__ import division
-from __future__ import print_function
-from __future__ import unicode_literals
-
-import os
-import random
-import sys
-
-# Insert the package's parent directory into the system search path, so that this package can be
-# imported when the aixi.py script is run directly from a release archive.
-PROJECT_ROOT = os.path.realpath(os.path.join(os.pardir, os.pardir))
-sys.path.insert(0, PROJECT_ROOT)
-
 from pyaixi import environment, util
 
 # Define a enumeration to represent agent interactions with the environment,
@@ -52,6 +39,27 @@ rStand = extended_tiger_reward_enum.rStand
 rListen = extended_tiger_reward_enum.rListen
 rGold   = extended_tiger_reward_enum.rGold
 
+# Text for each action, observation, reward and sitting state, used when printing.
+ACTION_TEXT      = {aListen: "listen",
+                    aLeft: "open left door",
+                    aRight: "open right door",
+                    aStand: "stand up"}
+OBSERVATION_TEXT = {oNull: "null",
+                    oLeft: "hear tiger at left door",
+                    oRight: "hear tiger at right door"}
+REWARD_TEXT      = {rTiger: "eaten",
+                    rInvalid: "invalid action",
+                    rStand: "stand up",
+                    rListen: "listen",
+                    rGold: "gold!"}
+STATE_TEXT       = {False: "standing",
+                    True: "sitting"}
+
+# The acceptable action, observation and reward values, shared by every instance.
+VALID_ACTIONS      = tuple(extended_tiger_action_enum.keys())
+VALID_OBSERVATIONS = tuple(extended_tiger_observation_enum.keys())
+VALID_REWARDS      = tuple(extended_tiger_reward_enum.keys())
+
 class ExtendedTiger(environment.Environment):
     """ The environment is a more elaborate version of Tiger.
 
@@ -104,6 +112,10 @@ class ExtendedTiger(environment.Environment):
     # Set the default probability for the listen accuracy.
     default_listen_accuracy = 0.85
 
+    # Class attributes.
+
+    __slots__ = ('gold', 'listen_accuracy', 'sitting', 'tiger')
+
     # Instance methods.
 
     def __init__(self, options = {}):
@@ -120,13 +132,16 @@ class ExtendedTiger(environment.Environment):
         environment.Environment.__init__(self, options = options)
 
         # Define the acceptable action values.
-        self.valid_actions = list(extended_tiger_action_enum.keys())
+        self.valid_actions = VALID_ACTIONS
 
         # Define the acceptable observation values.
-        self.valid_observations = list(extended_tiger_observation_enum.keys())
+        self.valid_observations = VALID_OBSERVATIONS
 
         # Define the acceptable reward values.
-        self.valid_rewards = list(extended_tiger_reward_enum.keys())
+        self.valid_rewards = VALID_REWARDS
+
+        # Work out the values derived from the acceptable values.
+        self.configure_valid_values()
 
         # Set the accuracy of the listen action.
         if 'tiger-listen-accuracy' not in options:
@@ -150,7 +165,7 @@ class ExtendedTiger(environment.Environment):
             (Called `performAction` in the C++ version.)
         """
 
-        assert self.is_valid_action(action)
+        assert action in self.valid_actions_set, "Invalid action given."
 
         # Save the action.
         self.action = action
@@ -162,7 +177,7 @@ class ExtendedTiger(environment.Environment):
         if (action == aListen and self.sitting):
             # Listen while sitting down, and return the correct door with probability
             # equal to self.listen_acurracy.
-            self.observation = self.tiger if random.random() < self.listen_accuracy else self.gold
+            self.observation = self.tiger if self.random() < self.listen_accuracy else self.gold
             self.reward = rListen
         elif (action == aLeft and not self.sitting):
             # Open the left door while standing. Get a reward based on what was behind
@@ -187,28 +202,13 @@ class ExtendedTiger(environment.Environment):
         """ Returns a string indicating the status of the environment.
         """
 
-        action_text      = {aListen: "listen",
-                            aLeft: "open left door",
-                            aRight: "open right door",
-                            aStand: "stand up"}
-        observation_text = {oNull: "null",
-                            oLeft: "hear tiger at left door",
-                            oRight: "hear tiger at right door"}
-        reward_text      = {rTiger: "eaten",
-                            rInvalid: "invalid action",
-                            rStand: "stand up",
-                            rListen: "listen",
-                            rGold: "gold!"}
-        state_text       = {False: "standing",
-                            True: "sitting"}
-
         # Show what just happened, correcting the reward for being defined relative to 100.
         message = "action = %s, observation = %s, reward = %s (%d), agent is now %s"% \
-                  (action_text[self.action],
-                   observation_text[self.observation],
-                   reward_text[self.reward],
+                  (ACTION_TEXT[self.action],
+                   OBSERVATION_TEXT[self.observation],
+                   REWARD_TEXT[self.reward],
                    (self.reward - 100),
-                   state_text[self.sitting])
+                   STATE_TEXT[self.sitting])
 
         return message
     # end def
@@ -219,7 +219,7 @@ class ExtendedTiger(environment.Environment):
         """
 
         # Place the tiger randomly.
-        self.tiger = oLeft if random.random() < 0.5 else oRight
+        self.tiger = oLeft if self.random() < 0.5 else oRight
 
         # Place the gold behind the opposite door.
         self.gold  = oRight if self.tiger == oLeft else oLeft
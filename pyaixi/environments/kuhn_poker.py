@@ -4,18 +4,7 @@
 Defines an environment for Kuhn Poker: a simplified, zero-sum version of poker.
 """
 
-from __future__ import division
-from __future__ import print_function
-from __future__ import unicode_literals
-
 import os
-import random
-import sys
-
-# Insert the package's parent directory into the system search path, so that this package can be
-# imported when the aixi.py script is run directly from a release archive.
-PROJECT_ROOT = os.path.realpath(os.path.join(os.pardir, os.pardir))
-sys.path.insert(0, PROJECT_ROOT)
 
 from pyaixi import environment, util
 
@@ -47,6 +36,11 @@ rPassLoss = kuhn_poker_reward_enum.rPassLoss
 rPassWin  = kuhn_poker_reward_enum.rPassWin
 rBetWin   = kuhn_poker_reward_enum.rBetWin
 
+# The acceptable action, observation and reward values, shared by every instance.
+VALID_ACTIONS      = tuple(kuhn_poker_action_enum.keys())
+VALID_OBSERVATIONS = tuple(kuhn_poker_observation_enum.keys())
+VALID_REWARDS      = tuple(kuhn_poker_reward_enum.keys())
+
 class KuhnPoker(environment.Environment):
     """ Kuhn Poker is a simplified, zero-sum, two player poker variant that uses a
         deck of three cards: a King, Queen and Jack.
@@ -90,6 +84,11 @@ class KuhnPoker(environment.Environment):
     bet_probability_queen = (1.0 + bet_probability_king) / 3.0
     bet_probability_jack  = bet_probability_king / 3.0
 
+    # Class attributes.
+
+    __slots__ = ('agent_card', 'agent_previous_card', 'env_action', 'env_card', 'env_previous_action',
+                 'env_previous_card')
+
     # Instance methods.
 
     def __init__(self, options = {}):
@@ -102,13 +101,16 @@ class KuhnPoker(environment.Environment):
         environment.Environment.__init__(self, options = options)
 
         # Define the acceptable action values.
-        self.valid_actions = list(kuhn_poker_action_enum.keys())
+        self.valid_actions = VALID_ACTIONS
 
         # Define the acceptable observation values.
-        self.valid_observations = list(kuhn_poker_observation_enum.keys())
+        self.valid_observations = VALID_OBSERVATIONS
 
         # Define the acceptable reward values.
-        self.valid_rewards = list(kuhn_poker_reward_enum.keys())
+        self.valid_rewards = VALID_REWARDS
+
+        # Work out the values derived from the acceptable values.
+        self.configure_valid_values()
 
         # Set the initial reward.
         self.reward = 0
@@ -138,7 +140,7 @@ class KuhnPoker(environment.Environment):
             (Called `performAction` in the C++ version.)
         """
 
-        assert self.is_valid_action(action)
+        assert action in self.valid_actions_set, "Invalid action given."
 
         # Save the action.
         self.action = action
@@ -153,7 +155,7 @@ class KuhnPoker(environment.Environment):
         # If the environment passed and the agent bet, then the environment has
         # a chance to change its mind.
         if self.action == aBet and self.env_action == aPass:
-            if self.env_card == oQueen and random.random() < self.bet_probability_queen:
+            if self.env_card == oQueen and self.random() < self.bet_probability_queen:
                 # Bet with the internal-default probability on seeing a king while having a queen.
                 self.env_action = aBet
             elif self.env_card == oKing:
@@ -206,7 +208,7 @@ class KuhnPoker(environment.Environment):
             (Called `randomCard` in the C++ version.)
         """
 
-        return util.choice([oJack, oQueen, oKing])
+        return util.choice([oJack, oQueen, oKing], self.rng)
     # end def
 
     def reset(self):
@@ -229,12 +231,12 @@ class KuhnPoker(environment.Environment):
         # Choose the environment's first action. Bet with a certain probability
         # on jack and king, pass on queen.
         if (self.env_card == oJack):
-            self.env_action = aBet if (random.random() < self.bet_probability_jack) else aPass
+            self.env_action = aBet if (self.random() < self.bet_probability_jack) else aPass
         elif(self.env_card == oQueen):
             # Always pass on a Queen.
             self.env_action = aPass
         elif(self.env_card == oKing):
-            self.env_action = aBet if (random.random() < self.bet_probability_king) else aPass
+            self.env_action = aBet if (self.random() < self.bet_probability_king) else aPass
         # end if
 
         # Compute an observation: agent-card + environment-bet-status
@@ -4,22 +4,9 @@
 Defines an environment for a two-dimensional maze.
 """
 
-from __future__ import division
-from __future__ import print_function
-from __future__ import unicode_literals
-
 import os
-import random
 import sys
 
-# Insert the package's parent directory into the system search path, so that this package can be
-# imported when the aixi.py script is run directly from a release archive.
-PROJECT_ROOT = os.path.realpath(os.path.join(os.pardir, os.pardir))
-sys.path.insert(0, PROJECT_ROOT)
-
-# Ensure xrange is defined on Python 3.
-from six.moves import xrange
-
 from pyaixi import environment, util
 
 # Define a enumeration to represent agent interactions with the environment,
@@ -55,6 +42,8 @@ cTeleportTo   = '*'
 cTeleportFrom = '!'
 cEmpty        = '&'
 
+# The acceptable action values, shared by every instance.
+VALID_ACTIONS = tuple(maze_action_enum.keys())
 
 class Maze(environment.Environment):
     """ A two-dimensional maze environment.
@@ -147,6 +136,12 @@ class Maze(environment.Environment):
                          the maze.
     """
 
+    # Class attributes.
+
+    __slots__ = ('col', 'col_to', 'max_reward', 'maze_layout', 'maze_rewards', 'num_cols', 'num_rows',
+                 'observation_encoding', 'observation_table', 'row', 'row_to', 'teleport_from_mask',
+                 'teleport_to_locations', 'teleported', 'transitions', 'wall_collision', 'wall_mask')
+
     # Instance methods.
 
     def __init__(self, options = {}):
@@ -162,13 +157,16 @@ class Maze(environment.Environment):
         self.configure(options)
 
         # Define the acceptable action values.
-        self.valid_actions = list(maze_action_enum.keys())
+        self.valid_actions = VALID_ACTIONS
 
         # Define the acceptable observation values.
-        self.valid_observations = xrange(0, self.max_observation() + 1)
+        self.valid_observations = range(0, self.max_observation() + 1)
 
         # Define the acceptable reward values.
-        self.valid_rewards = xrange(0, self.max_reward + 1)
+        self.valid_rewards = range(0, self.max_reward + 1)
+
+        # Work out the values derived from the acceptable values.
+        self.configure_valid_values()
 
         # Assign the location of the agent randomly.
         self.teleport_agent()
@@ -186,27 +184,39 @@ class Maze(environment.Environment):
             (Called `calculate_observation` in C++ version.)
         """
 
+        # Look up the observation for this square in the table precomputed by `configure`.
+        self.observation = self.observation_table[self.row][self.col]
+    # end def
+
+    def observation_at(self, row, col):
+        """ Returns the observation the agent receives when at the given `row` and `col`,
+            given the observation encoding (`self.observation_encoding`).
+
+            Used by `configure` to precompute the observation for each square.
+        """
+
         if self.observation_encoding == cUninformative:
             # Uninformative observation: agent always receives same observation.
-            self.observation = oNull
+            return oNull
         elif self.observation_encoding == cWalls:
             # Agent observes adjacent walls.
-            self.observation = 0
-            if self.col == 0 or self.maze_layout[self.row][self.col - 1] == cWall:
-                self.observation += oLeftWall
+            observation = 0
+            if col == 0 or self.wall_mask[row][col - 1]:
+                observation += oLeftWall
             # end if
-            if self.row == 0 or self.maze_layout[self.row - 1][self.col] == cWall:
-                self.observation += oUpWall
+            if row == 0 or self.wall_mask[row - 1][col]:
+                observation += oUpWall
             # end if
-            if self.col + 1 == self.num_cols or self.maze_layout[self.row][self.col + 1] == cWall:
-                self.observation += oRightWall
+            if col + 1 == self.num_cols or self.wall_mask[row][col + 1]:
+                observation += oRightWall
             # end if
-            if self.row + 1 == self.num_rows or self.maze_layout[self.row + 1][self.col] == cWall:
-                self.observation += oDownWall
+            if row + 1 == self.num_rows or self.wall_mask[row + 1][col]:
+                observation += oDownWall
             # end if
+            return observation
         elif self.observation_encoding == cCoordinates:
             # Agent observes the coordinates of its current square.
-            self.observation = self.row * self.num_cols + self.col
+            return row * self.num_cols + col
         # end if
     # end def
 
@@ -261,7 +271,7 @@ class Maze(environment.Environment):
         self.maze_rewards = {}
         self.maze_layout = {}
         self.teleport_to_locations = []
-        for r in xrange(0, self.num_rows):
+        for r in range(0, self.num_rows):
             # Get the reward string for the current row from the options.
             reward_option_name = "maze-rewards%d" % (r + 1)
             rewards = options.get(reward_option_name, None)
@@ -319,7 +329,7 @@ class Maze(environment.Environment):
 
             # Turn the layout and reward strings into dictionary/two-dimensional array entries,
             # checking each value as it's inspected.
-            for c in xrange(0, self.num_cols):
+            for c in range(0, self.num_cols):
                 #
                 this_layout = layout_list[c]
                 this_reward = int(rewards_list[c])
@@ -350,11 +360,50 @@ class Maze(environment.Environment):
 
         # Adjust rewards so they begin at 0.
         self.max_reward -= min_reward
-        for r in xrange(0,  self.num_rows):
-            for c in xrange(0, self.num_cols):
+        for r in range(0,  self.num_rows):
+            for c in range(0, self.num_cols):
                 self.maze_rewards[r][c] = self.maze_rewards[r][c] - min_reward
             # end for
         # end for
+
+        # Precompute which squares are walls, and which squares teleport the agent, so that
+        # moving the agent only needs a list lookup rather than a layout lookup and comparison.
+        self.wall_mask = [[self.maze_layout[r][c] == cWall for c in range(0, self.num_cols)]
+                          for r in range(0, self.num_rows)]
+        self.teleport_from_mask = [[self.maze_layout[r][c] == cTeleportFrom for c in range(0, self.num_cols)]
+                                   for r in range(0, self.num_rows)]
+
+        # Precompute the observation the agent receives in each square.
+        self.observation_table = [[self.observation_at(r, c) for c in range(0, self.num_cols)]
+                                  for r in range(0, self.num_rows)]
+
+        # Precompute the outcome of each action from each square, ignoring teleportation:
+        # `self.transitions[row][col][action]` is a tuple of the square the agent attempts to
+        # move to, the square the agent ends up in, the reward, and whether the agent hit a wall.
+        self.transitions = []
+        for r in range(0, self.num_rows):
+            row_transitions = []
+            for c in range(0, self.num_cols):
+                square_transitions = [None] * len(maze_action_enum)
+                for action in maze_action_enum.keys():
+                    # Calculate the square the agent is attempting to move to, making sure they
+                    # don't move outside the maze.
+                    row_to = (-1 if action == aUp else 0) + (1 if action == aDown else 0)
+                    row_to = min(max(row_to + r, 0), self.num_rows - 1)
+                    col_to = (-1 if action == aLeft else 0) + (1 if action == aRight else 0)
+                    col_to = min(max(col_to + c, 0), self.num_cols - 1)
+
+                    # The agent stays put if it would walk into a wall.
+                    wall_collision = self.wall_mask[row_to][col_to]
+                    new_row, new_col = (r, c) if wall_collision else (row_to, col_to)
+
+                    square_transitions[action] = (row_to, col_to, new_row, new_col,
+                                                  self.maze_rewards[row_to][col_to], wall_collision)
+                # end for
+                row_transitions.append(square_transitions)
+            # end for
+            self.transitions.append(row_transitions)
+        # end for
     # end def
 
     def max_observation(self):
@@ -382,41 +431,26 @@ class Maze(environment.Environment):
             (Called `performAction` in the C++ version.)
         """
 
-        assert self.is_valid_action(action)
+        assert action in self.valid_actions_set, "Invalid action given."
 
         # Save the action.
         self.action = action
 
-        # Set the flags for this action.
+        # Look up the square the agent attempts to move to, where it ends up, the reward for
+        # the square the agent *attempted* to move into (regardless of whether they were able
+        # to move into it), and whether the agent walked into a wall.
         self.teleported = False
-        self.wall_collision = False
-
-        # Calculate the square the agent is attempting to move to, making sure they
-        # don't move outside the maze.
-        self.row_to = (-1 if action == aUp else 0) + (1 if action == aDown else 0)
-        self.row_to = min(max(self.row_to + self.row, 0), self.num_rows - 1)
-        self.col_to = (-1 if action == aLeft else 0) + (1 if action == aRight else 0)
-        self.col_to = min(max(self.col_to + self.col, 0), self.num_cols - 1)
-
-        # Move the agent, making sure they don't walk into a wall.
-        self.wall_collision = (self.maze_layout[self.row_to][self.col_to] == cWall)
-        if not self.wall_collision:
-            self.row = self.row_to
-            self.col = self.col_to
-        # end if
+        (self.row_to, self.col_to, self.row, self.col, self.reward, self.wall_collision) = \
+            self.transitions[self.row][self.col][action]
 
         # Teleport if appropriate.
-        if self.maze_layout[self.row][self.col] == cTeleportFrom:
+        if self.teleport_from_mask[self.row][self.col]:
             self.teleport_agent()
         # end if
 
-        # Calculate the reward for the square the agent *attempted* to move into,
-        # regardless of whether they were able to move into it.
-        self.reward = self.maze_rewards[self.row_to][self.col_to]
-
         # Calculate the observation for the square the agent is now in.
         # That is, after any movement or teleportation has occurred.
-        self.calculate_observation()
+        self.observation = self.observation_table[self.row][self.col]
 
         return (self.observation, self.reward)
     # end def
@@ -432,8 +466,8 @@ class Maze(environment.Environment):
                   (", teleported" if self.teleported else "") + \
                   (", wall collision" if self.wall_collision else "") + os.linesep
 
-        for r in xrange(0, self.num_rows):
-            for c in xrange(0, self.num_cols):
+        for r in range(0, self.num_rows):
+            for c in range(0, self.num_cols):
                 if self.row == r and self.col == c:
                     message += "A"
                 else:
@@ -457,6 +491,6 @@ class Maze(environment.Environment):
         # This is altered from the C++ version to be far more efficient.
         # (e.g. instead of random search of the maze, use a random choice
         #  over a pre-computed list of possible destinations.)
-        self.row, self.col = util.choice(self.teleport_to_locations)
+        self.row, self.col = util.choice(self.teleport_to_locations, self.rng)
     # end def
 # end class
\ No newline at end of file
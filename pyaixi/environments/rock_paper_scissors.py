@@ -4,19 +4,6 @@
 Defines an environment for an agent playing Rock Paper Scissors against the environment.
 """
 
-from __future__ import division
-from __future__ import print_function
-from __future__ import unicode_literals
-
-import os
-import random
-import sys
-
-# Insert the package's parent directory into the system search path, so that this package can be
-# imported when the aixi.py script is run directly from a release archive.
-PROJECT_ROOT = os.path.realpath(os.path.join(os.pardir, os.pardir))
-sys.path.insert(0, PROJECT_ROOT)
-
 from pyaixi import environment, util
 
 # Define a enumeration to represent rock-paper-scissors actions, which is the
@@ -43,6 +30,20 @@ rLose     = rock_paper_scissors_reward_enum.rLose
 rDraw     = rock_paper_scissors_reward_enum.rDraw
 rWin      = rock_paper_scissors_reward_enum.rWin
 
+# The agent's reward, indexed by the difference between its move and the opponent's, modulo 3.
+# (As each move beats the one before it, in the order rock, paper, scissors, a difference of 0 is a
+# draw, 1 is a win, and 2 is a loss.)
+RESULT_REWARDS = (rDraw, rWin, rLose)
+
+# Text for each move and reward, used when printing, indexed by their enumeration values.
+MOVE_TEXT   = ("rock", "paper", "scissors")
+REWARD_TEXT = ("loses", "draws", "wins")
+
+# The acceptable action, observation and reward values, shared by every instance.
+VALID_ACTIONS      = tuple(rock_paper_scissors_action_enum.keys())
+VALID_OBSERVATIONS = tuple(rock_paper_scissors_observation_enum.keys())
+VALID_REWARDS      = tuple(rock_paper_scissors_reward_enum.keys())
+
 class RockPaperScissors(environment.Environment):
     """ The agent repeatedly plays Rock-Paper-Scissor against an opponent that has
         a slight, predictable bias in its strategy.
@@ -61,6 +62,10 @@ class RockPaperScissors(environment.Environment):
          - maximum reward: 2 (2 bits)
     """
 
+    # Class attributes.
+
+    __slots__ = ()
+
     # Instance methods.
 
     def __init__(self, options = {}):
@@ -73,13 +78,16 @@ class RockPaperScissors(environment.Environment):
         environment.Environment.__init__(self, options = options)
 
         # Define the acceptable action values.
-        self.valid_actions = list(rock_paper_scissors_action_enum.keys())
+        self.valid_actions = VALID_ACTIONS
 
         # Define the acceptable observation values.
-        self.valid_observations = list(rock_paper_scissors_observation_enum.keys())
+        self.valid_observations = VALID_OBSERVATIONS
 
         # Define the acceptable reward values.
-        self.valid_rewards = list(rock_paper_scissors_reward_enum.keys())
+        self.valid_rewards = VALID_REWARDS
+
+        # Work out the values derived from the acceptable values.
+        self.configure_valid_values()
 
         # Set an initial percept.
         # (i.e. not rock, to ensure a random choice in the opponent on the first action.)
@@ -93,7 +101,7 @@ class RockPaperScissors(environment.Environment):
             (Called `performAction` in the C++ version.)
         """
 
-        assert self.is_valid_action(action)
+        assert action in self.valid_actions_set, "Invalid action given."
 
         # Save the action.  
         self.action = action
@@ -103,39 +111,65 @@ class RockPaperScissors(environment.Environment):
         if (self.observation == aRock) and (self.reward == rLose):
             self.observation = aRock
         else:
-            self.observation = util.choice(self.valid_actions)
+            # (Indexing by a scaled random number, as `util.choice` does, but without the extra call.)
+            self.observation = self.valid_actions[int(self.random() * self.n_actions)]
         # end if
 
-        # Determine reward.
-        if action == self.observation:
-            # If both the agent and the opponent made the same move, it's a draw.
-            self.reward = rDraw
-        elif action == aRock:
-            # If the opponent made a scissors move, then the agent wins if they played rock.
-            self.reward = rWin if self.observation == oScissors else rLose
-        elif action == aScissors:
-            # If the opponent made a paper move, then the agent wins if they played scissors.
-            self.reward = rWin if self.observation == oPaper else rLose
-        elif action == aPaper:
-            # If the opponent made a rock move, then the agent wins if they played paper.
-            self.reward = rWin if self.observation == oRock else rLose
-        # end if
+        # Determine reward, from how far the agent's move is ahead of the opponent's.
+        self.reward = RESULT_REWARDS[(action - self.observation) % 3]
 
         # Return the resulting observation and reward.
         return (self.observation, self.reward)
     # end def
 
+    def perform_actions(self, actions):
+        """ Performs each of the given actions in turn, and returns a list of the resulting percepts.
+
+            Plays the whole batch in one loop over local variables, giving the same results as
+            calling `perform_action()` for each action in turn.
+
+            - `actions`: the sequence of actions to perform.
+        """
+
+        actions = list(actions)
+        valid_actions_set = self.valid_actions_set
+        assert all(action in valid_actions_set for action in actions), "Invalid action given."
+
+        random = self.random
+        valid_actions = self.valid_actions
+        n_actions = self.n_actions
+        observation = self.observation
+        reward = self.reward
+
+        percepts = []
+        for action in actions:
+            # Opponent plays rock if it won the last round by playing rock, otherwise
+            # it plays randomly.
+            if (observation != aRock) or (reward != rLose):
+                observation = valid_actions[int(random() * n_actions)]
+            # end if
+
+            reward = RESULT_REWARDS[(action - observation) % 3]
+            percepts.append((observation, reward))
+        # end for
+
+        # Store the last action, observation and reward in the environment.
+        if len(actions) > 0:
+            self.action = actions[-1]
+        # end if
+        self.observation = observation
+        self.reward = reward
+
+        return percepts
+    # end def
+
     def print(self):
         """ Returns a string indicating the status of the environment.
         """
 
-        action_text      = {aRock: "rock", aPaper: "paper", aScissors: "scissors"}
-        observation_text = {oRock: "rock", oPaper: "paper", oScissors: "scissors"}
-        reward_text      = {rLose: "loses", rDraw: "draws", rWin: "wins"}
-
-        message = "Agent played " + action_text[self.action] + ", " + \
-                  "environment played " + observation_text[self.observation] + "\t" + \
-                  "Agent " + reward_text[self.reward]
+        message = "Agent played " + MOVE_TEXT[self.action] + ", " + \
+                  "environment played " + MOVE_TEXT[self.observation] + "\t" + \
+                  "Agent " + REWARD_TEXT[self.reward]
 
         return message
     # end def
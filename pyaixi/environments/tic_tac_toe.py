@@ -4,21 +4,7 @@
 Defines an environment for Tic Tac Toe.
 """
 
-from __future__ import division
-from __future__ import print_function
-from __future__ import unicode_literals
-
 import os
-import random
-import sys
-
-# Insert the package's parent directory into the system search path, so that this package can be
-# imported when the aixi.py script is run directly from a release archive.
-PROJECT_ROOT = os.path.realpath(os.path.join(os.pardir, os.pardir))
-sys.path.insert(0, PROJECT_ROOT)
-
-# Ensure xrange is defined on Python 3.
-from six.moves import xrange
 
 from pyaixi import environment, util
 
@@ -43,6 +29,135 @@ rNull    = tictactoe_reward_enum.rNull
 rDraw    = tictactoe_reward_enum.rDraw
 rWin     = tictactoe_reward_enum.rWin
 
+# The board is represented by a pair of 9-bit masks, one for the squares occupied by the agent
+# and one for the squares occupied by the environment. Square `r * 3 + c` (i.e. the action that
+# plays there) is bit `r * 3 + c` of each mask.
+
+# The masks of the squares making up each row, column, and diagonal of the board.
+WIN_MASKS = (0o007, 0o070, 0o700, # Rows.
+             0o111, 0o222, 0o444, # Columns.
+             0o421, 0o124)        # Diagonals.
+
+# The part of the observation for each piece in each square, as `CELL_OBSERVATION_BITS[square][piece]`.
+# Each square has its own two bits of the observation, with the top-left square in the most
+# significant position, holding the piece in it. As no two squares share bits, the observation
+# of a board is the XOR of the parts for each piece on it, and placing a piece is a single XOR.
+CELL_OBSERVATION_BITS = [[piece << (2 * (8 - square)) for piece in range(0, 3)] for square in range(0, 9)]
+
+def mask_observation(mask, piece):
+    """ Returns the part of the observation for the given piece in each square of the given mask.
+    """
+
+    observation = 0
+    for square in range(0, 9):
+        if mask & (1 << square):
+            observation ^= CELL_OBSERVATION_BITS[square][piece]
+        # end if
+    # end for
+
+    return observation
+# end def
+
+# The contribution of each possible agent or environment mask to the observation, so that
+# the observation for the current masks is the XOR of the two entries.
+AGENT_OBSERVATIONS = [mask_observation(mask, oAgent) for mask in range(0, 512)]
+ENV_OBSERVATIONS = [mask_observation(mask, oEnv) for mask in range(0, 512)]
+
+# The outcomes of every action from every reachable board, keyed by `(agent_mask << 9) | env_mask`.
+# Each entry is a list, indexed by action, of the tuple of equally likely outcomes of that action.
+# Each outcome is a `(reward, agent_mask, env_mask, observation, key)` tuple, where `key` is the
+# key of the resulting board, and an agent mask of zero means the game ended and the board was cleared.
+# (Filled in by `build_transitions` when the first environment is created.)
+TRANSITIONS = {}
+
+# Whether each possible mask fills a row, column, or diagonal: 1 if so, 0 otherwise.
+# (A bytearray, to store one byte per mask.)
+WIN_LUT = bytearray(1 if any((mask & win_mask) == win_mask for win_mask in WIN_MASKS) else 0
+                    for mask in range(0, 512))
+
+# The empty squares for each possible mask of occupied squares.
+EMPTY_CELLS = [tuple(square for square in range(0, 9) if not mask & (1 << square))
+               for mask in range(0, 512)]
+
+def has_won(mask):
+    """ Returns True if the squares in the given mask fill a row, column, or diagonal.
+    """
+
+    return WIN_LUT[mask] == 1
+# end def
+
+def build_transitions():
+    """ Fills in `TRANSITIONS` by exploring every board reachable from the empty board,
+        following the same rules as `Tic_Tac_Toe.perform_action`.
+    """
+
+    # Ending the game clears the board.
+    def game_over(reward):
+        return ((reward, 0, 0, 0, 0),)
+    # end def
+
+    # Explore each board, along with its observation.
+    boards = [(0, 0, 0)]
+    TRANSITIONS[0] = None
+    while boards:
+        agent_mask, env_mask, observation = boards.pop()
+        occupied = agent_mask | env_mask
+
+        # The number of moves each player has made so far. (The environment replies to every
+        # agent move that doesn't end the game, so both players have made the same number.)
+        # Neither player can have won until they've placed three pieces.
+        moves = bin(agent_mask).count('1')
+        can_win = moves >= 2
+
+        action_outcomes = []
+        for action in range(0, 9):
+            square = 1 << action
+
+            if square & occupied:
+                # An invalid move.
+                outcomes = game_over(rInvalid)
+            elif can_win and has_won(agent_mask | square):
+                # The agent wins.
+                outcomes = game_over(rWin)
+            elif moves == 4:
+                # This is the agent's fifth move, so it must be a draw.
+                outcomes = game_over(rDraw)
+            else:
+                # The environment plays uniformly at random in one of the remaining empty squares.
+                outcomes = []
+                new_agent_mask = agent_mask | square
+                agent_observation = observation ^ CELL_OBSERVATION_BITS[action][oAgent]
+                for env_action in EMPTY_CELLS[occupied | square]:
+                    new_env_mask = env_mask | (1 << env_action)
+                    if can_win and has_won(new_env_mask):
+                        # The environment wins.
+                        outcomes += game_over(rLoss)
+                    else:
+                        # The game continues.
+                        new_observation = agent_observation ^ CELL_OBSERVATION_BITS[env_action][oEnv]
+                        key = (new_agent_mask << 9) | new_env_mask
+                        outcomes.append((rNull, new_agent_mask, new_env_mask, new_observation, key))
+
+                        # Make sure we explore this board too.
+                        if key not in TRANSITIONS:
+                            TRANSITIONS[key] = None
+                            boards.append((new_agent_mask, new_env_mask, new_observation))
+                        # end if
+                    # end if
+                # end for
+                outcomes = tuple(outcomes)
+            # end if
+
+            action_outcomes.append(outcomes)
+        # end for
+
+        TRANSITIONS[(agent_mask << 9) | env_mask] = action_outcomes
+    # end while
+# end def
+
+# The acceptable reward values, shared by every instance.
+VALID_REWARDS = tuple(tictactoe_reward_enum.keys())
+
 class Tic_Tac_Toe(environment.Environment):
     """ In this domain, the agent plays repeated games of TicTacToe against an
         opponent who moves randomly. If the agent wins the game, it receives a
@@ -60,6 +175,10 @@ class Tic_Tac_Toe(environment.Environment):
         - maximum reward: 5 (3 bits)
     """
 
+    # Class attributes.
+
+    __slots__ = ('actions_since_reset', 'agent_mask', 'board_key', 'env_mask')
+
     # Instance methods.
 
     def __init__(self, options = {}):
@@ -71,14 +190,22 @@ class Tic_Tac_Toe(environment.Environment):
         # Set up the base environment.
         environment.Environment.__init__(self, options = options)
 
+        # Work out the outcomes of every move, if no other environment has done so already.
+        if not TRANSITIONS:
+            build_transitions()
+        # end if
+
         # Define the acceptable action values.
-        self.valid_actions = xrange(0, 9)
+        self.valid_actions = range(0, 9)
 
         # Define the acceptable observation values.
-        self.valid_observations = xrange(0, 174672 + 1)
+        self.valid_observations = range(0, 174672 + 1)
 
         # Define the acceptable reward values.
-        self.valid_rewards = list(tictactoe_reward_enum.keys())
+        self.valid_rewards = VALID_REWARDS
+
+        # Work out the values derived from the acceptable values.
+        self.configure_valid_values()
 
         # Set the initial reward.
         self.reward = 0
@@ -94,43 +221,8 @@ class Tic_Tac_Toe(environment.Environment):
             (Called `checkWin` in the C++ version.)
         """
 
-        # Check if we've got a row of three matching symbols.
-        for r in xrange(0, 3):
-            # Is this row all matching, non-empty symbols?
-            if (self.board[r][0] != oEmpty and \
-                self.board[r][0] == self.board[r][1] and \
-                self.board[r][1] == self.board[r][2]):
-                # Yes. Someone has won.
-                return True
-            # end if
-        # end for
-
-        # Check if we've got any columns of three matching symbols.
-        for c in xrange(0, 3):
-            # Is this column all matching, non-empty symbols?
-            if (self.board[0][c] != oEmpty and \
-                self.board[0][c] == self.board[1][c] and \
-                self.board[1][c] == self.board[2][c]):
-                # Yes. Someone has won.
-                return True
-            # end if
-        # end for
-
-        # Check the diagonals.
-        if (self.board[1][1] != oEmpty and \
-            self.board[0][0] == self.board[1][1] and \
-            self.board[1][1] == self.board[2][2]):
-            return True
-        # end if
-
-        if (self.board[1][1] != oEmpty and \
-            self.board[0][2] == self.board[1][1] and \
-            self.board[1][1] == self.board[2][0]):
-            return True
-        # end if
-
-        # If we're here, there's no winner yet.
-        return False
+        # Has either player filled a row, column, or diagonal?
+        return bool(WIN_LUT[self.agent_mask] | WIN_LUT[self.env_mask])
     # end def
 
     def compute_observation(self):
@@ -141,76 +233,37 @@ class Tic_Tac_Toe(environment.Environment):
             (Called `computeObservation` in the C++ version.)
         """
 
-        self.observation = 0
-        for r in xrange(0, 3):
-            for c in xrange(0, 3):
-                # Shift the existing observation up by 2 bits, and add the current observation to
-                # that.
-                self.observation = self.board[r][c] + (4 * self.observation)
-            # end for
-        # end for
+        self.observation = AGENT_OBSERVATIONS[self.agent_mask] ^ ENV_OBSERVATIONS[self.env_mask]
     # end def
 
-    def perform_action(self, action):
+    def perform_action(self, action, _transitions = TRANSITIONS, _choice = util.choice):
         """ Receives the agent's action and calculates the new environment percept.
             (Called `performAction` in the C++ version.)
+
+            (The underscored arguments bind module-level names as local variables, for speed,
+             and should not be given.)
         """
 
-        assert self.is_valid_action(action)
+        assert action in self.valid_actions_set, "Invalid action given."
 
         # Save the action.
         self.action = action
 
-        # Increment the actions-since-reset counter.
-        self.actions_since_reset += 1
-
-        # Decode the action into the desired row and column to update.
-        r = int(action / 3)
-        c = action % 3
+        # Look up the possible outcomes of this action on the current board.
+        outcomes = _transitions[self.board_key][action]
 
-        # If agent makes an invalid move, give the appropriate (lack of) reward and clear the board.
-        if (self.board[r][c] != oEmpty):
-            self.reward = rInvalid
-            self.reset()
-            return
-        # end def
+        # If the environment gets to move, it plays randomly, so pick one of the outcomes at random.
+        outcome = outcomes[0] if len(outcomes) == 1 else _choice(outcomes, self.rng)
+        (self.reward, self.agent_mask, self.env_mask, self.observation, self.board_key) = outcome
 
-        # The agent makes their move.
-        self.board[r][c] = oAgent
-
-        # If the agent wins or draws, give an appropriate reward and clear the board.
-        if (self.check_win()):
-            self.reward = rWin
-            self.reset()
-            return
-        elif self.actions_since_reset == 5:
-            # If it's been 5 actions since the reset, then this must be a draw, as there's
-            # no way to win from this point.
-            self.reward = rDraw
-            self.reset()
-            return
-        # end def
-
-        # The environment makes a random play.
-        while (self.board[r][c] != oEmpty):
-            # Keep picking board positions at random until we find an unoccupied spot.
-            r = random.randrange(0, 3)
-            c = random.randrange(0, 3)
-        # end while
-
-        # If we're here, we've got an unoccupied spot.
-        self.board[r][c] = oEnv
-
-        # If the environment has won, give an appropriate reward and clear the board.
-        if (self.check_win()):
-            self.reward = rLoss
-            self.reset()
+        # If the game ended (from an invalid move, a win, a loss, or a draw), the board was cleared.
+        if self.agent_mask == 0:
+            self.actions_since_reset = 0
             return
-        # end def
+        # end if
 
         # The game continues.
-        self.reward = rNull
-        self.compute_observation()
+        self.actions_since_reset += 1
 
         return (self.observation, self.reward)
     # end def
@@ -223,15 +276,10 @@ class Tic_Tac_Toe(environment.Environment):
         message = "action = %s, observation = %s, reward = %s (%d), board:" % \
                   (self.action, self.observation, self.reward, (self.reward - 3)) + os.linesep
 
-        # Display the current state of the board.
-        for r in xrange(0, 3):
-            for c in xrange(0, 3):
-                b = self.board[r][c]
-                message += "." if b == oEmpty else ("A" if b == oAgent else "O")
-            # end for
-            message += os.linesep
-        # end for
-        message += os.linesep
+        # Display the current state of the board, one row per line, followed by a blank line.
+        board = "".join(["A" if self.agent_mask & (1 << square) else \
+                         ("O" if self.env_mask & (1 << square) else ".") for square in range(0, 9)])
+        message += os.linesep.join([board[0:3], board[3:6], board[6:9], "", ""])
 
         return message
     # end def
@@ -240,20 +288,12 @@ class Tic_Tac_Toe(environment.Environment):
         """ Begin a new game.
         """
 
-        # Set up the board.
-        self.board = {}
+        # Set up the board, with no squares occupied by either player.
+        self.agent_mask = 0
+        self.env_mask = 0
 
-        for r in xrange(0, 3):
-            for c in xrange(0, 3):
-                # Ensure the row exists.
-                if r not in self.board:
-                    self.board[r] = {}
-                # end if
-
-                # Set this element to be empty.
-                self.board[r][c] = oEmpty
-            # end for
-        # end for
+        # The key of the board in the transition table, `(agent_mask << 9) | env_mask`.
+        self.board_key = 0
 
         # Set an initial observation.
         self.compute_observation()
@@ -261,4 +301,22 @@ class Tic_Tac_Toe(environment.Environment):
         # Set the actions-since-reset marker.
         self.actions_since_reset = 0
     # end def
+
+    def restore(self, snapshot):
+        """ Restores the state of the game from the given snapshot, as returned by `snapshot()`.
+
+            - `snapshot`: the snapshot of the state to restore.
+        """
+
+        (self.agent_mask, self.env_mask, self.board_key, self.action,
+         self.actions_since_reset, self.observation, self.reward) = snapshot
+    # end def
+
+    def snapshot(self):
+        """ Returns a snapshot of the state of the game, which can later be given to `restore()`.
+        """
+
+        return (self.agent_mask, self.env_mask, self.board_key, self.action,
+                self.actions_since_reset, self.observation, self.reward)
+    # end def
 # end class
\ No newline at end of file
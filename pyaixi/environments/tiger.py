@@ -5,19 +5,6 @@ Defines an environment for an agent interacting with an environment where there'
 a tiger and a pot of gold hidden separately, behind two closed doors.
 """
 
-from __future__ import division
-from __future__ import print_function
-from __future__ import unicode_literals
-
-import os
-import random
-import sys
-
-# Insert the package's parent directory into the system search path, so that this package can be
-# imported when the aixi.py script is run directly from a release archive.
-PROJECT_ROOT = os.path.realpath(os.path.join(os.pardir, os.pardir))
-sys.path.insert(0, PROJECT_ROOT)
-
 from pyaixi import environment, util
 
 # Define a enumeration to represent agent interactions with the environment,
@@ -48,6 +35,28 @@ rEaten  = tiger_reward_enum.rEaten
 rListen = tiger_reward_enum.rListen
 rGold   = tiger_reward_enum.rGold
 
+# Text for each action, observation and reward, used when printing.
+ACTION_TEXT      = {aListen: "listen",
+                    aLeft: "open left door",
+                    aRight: "open right door"}
+OBSERVATION_TEXT = {oNull: "null",
+                    oLeft: "hear tiger at left door",
+                    oRight: "hear tiger at right door"}
+REWARD_TEXT      = {rEaten: "eaten",
+                    rListen: "listen",
+                    rGold: "gold!"}
+
+# XOR-ing either door with this gives the other door.
+DOOR_SWAP = oLeft ^ oRight
+
+# The number of random bits used to decide whether listening gives the correct door.
+LISTEN_BITS = 30
+
+# The acceptable action, observation and reward values, shared by every instance.
+VALID_ACTIONS      = tuple(tiger_action_enum.keys())
+VALID_OBSERVATIONS = tuple(tiger_observation_enum.keys())
+VALID_REWARDS      = tuple(tiger_reward_enum.keys())
+
 class Tiger(environment.Environment):
     """ The environment dynamics are as follows: a tiger and a pot of gold are
         hidden behind one of two doors.
@@ -85,6 +94,10 @@ class Tiger(environment.Environment):
     # Set the default probability for the listen accuracy.
     default_listen_accuracy = 0.85
 
+    # Class attributes.
+
+    __slots__ = ('action_handlers', 'gold', 'listen_accuracy', 'listen_threshold', 'tiger')
+
     # Instance methods.
 
     def __init__(self, options = {}):
@@ -101,13 +114,16 @@ class Tiger(environment.Environment):
         environment.Environment.__init__(self, options = options)
 
         # Define the acceptable action values.
-        self.valid_actions = list(tiger_action_enum.keys())
+        self.valid_actions = VALID_ACTIONS
 
         # Define the acceptable observation values.
-        self.valid_observations = list(tiger_observation_enum.keys())
+        self.valid_observations = VALID_OBSERVATIONS
 
         # Define the acceptable reward values.
-        self.valid_rewards = list(tiger_reward_enum.keys())
+        self.valid_rewards = VALID_REWARDS
+
+        # Work out the values derived from the acceptable values.
+        self.configure_valid_values()
 
         # Set the accuracy of the listen action.
         if 'tiger-listen-accuracy' not in options:
@@ -118,6 +134,16 @@ class Tiger(environment.Environment):
         # Make sure the accuracy value is valid.
         assert 0.0 <= self.listen_accuracy and self.listen_accuracy <= 1.0
 
+        # Convert the accuracy to a threshold on a random `LISTEN_BITS`-bit integer, so that
+        # listening only needs an integer comparison.
+        self.listen_threshold = int(self.listen_accuracy * (1 << LISTEN_BITS))
+
+        # The method that performs each action, indexed by action.
+        self.action_handlers = [None] * len(tiger_action_enum)
+        self.action_handlers[aListen] = self.listen
+        self.action_handlers[aLeft]   = self.open_left_door
+        self.action_handlers[aRight]  = self.open_right_door
+
         # Place the tiger.
         self.place_tiger()
 
@@ -126,35 +152,68 @@ class Tiger(environment.Environment):
         self.reward = 0
     # end def
 
+    def listen(self, _rListen = rListen, _listen_bits = LISTEN_BITS):
+        """ Performs the listen action: the agent hears the tiger behind the correct door with
+            probability equal to `self.listen_accuracy`, and behind the other door otherwise.
+
+            Returns the new percept, as a tuple of the observation and reward.
+
+            (The underscored arguments bind module-level names as local variables, for speed,
+             and should not be given.)
+        """
+
+        self.reward = _rListen
+        self.observation = self.tiger if self.rng.getrandbits(_listen_bits) < self.listen_threshold else self.gold
+
+        return (self.observation, self.reward)
+    # end def
+
+    def open_left_door(self, _oNull = oNull, _oLeft = oLeft, _rEaten = rEaten, _rGold = rGold):
+        """ Performs the open left door action, then replaces the tiger and the gold.
+
+            Returns the new percept, as a tuple of the observation and reward.
+
+            (The underscored arguments bind module-level names as local variables, for speed,
+             and should not be given.)
+        """
+
+        # Set the reward according to what we find, and set the observation to null.
+        self.reward = _rEaten if self.tiger == _oLeft else _rGold
+        self.observation = _oNull
+        self.place_tiger()
+
+        return (self.observation, self.reward)
+    # end def
+
+    def open_right_door(self, _oNull = oNull, _oRight = oRight, _rEaten = rEaten, _rGold = rGold):
+        """ Performs the open right door action, then replaces the tiger and the gold.
+
+            Returns the new percept, as a tuple of the observation and reward.
+
+            (The underscored arguments bind module-level names as local variables, for speed,
+             and should not be given.)
+        """
+
+        # Set the reward according to what we find, and set the observation to null.
+        self.reward = _rEaten if self.tiger == _oRight else _rGold
+        self.observation = _oNull
+        self.place_tiger()
+
+        return (self.observation, self.reward)
+    # end def
+
     def perform_action(self, action):
         """ Receives the agent's action and calculates the new environment percept.
             (Called `performAction` in the C++ version.)
         """
 
-        assert self.is_valid_action(action)
+        assert action in self.valid_actions_set, "Invalid action given."
 
         # Save the action.
         self.action = action
 
-        if (action == aListen):
-            # Listen for the tiger, and return the correct door with probability
-            # equal to self.listen_accuracy.
-            self.reward = rListen
-            self.observation = self.tiger if random.random() < self.listen_accuracy else self.gold
-        else:
-            # Open a door. Set the reward according to what we find.
-            if (action == aLeft):
-                self.reward = rEaten if self.tiger == oLeft else rGold
-            elif (action == aRight):
-                self.reward = rEaten if self.tiger == oRight else rGold
-            # end if
-
-            # Set the observation to null, and replace the tiger and the gold.
-            self.observation = oNull
-            self.place_tiger()
-        # end if
-
-        return (self.observation, self.reward)
+        # Perform the action using its handler.
+        return self.action_handlers[action]()
     # end def
 
     def place_tiger(self):
@@ -163,31 +222,38 @@ class Tiger(environment.Environment):
             (Called `placeTiger` in the C++ version.)
         """
 
-        self.tiger = oLeft if random.random() < 0.5 else oRight
-        self.gold  = oRight if self.tiger == oLeft else oLeft
+        # Pick a door with a single random bit, and put the gold behind the other one.
+        self.tiger = oLeft + self.rng.getrandbits(1)
+        self.gold  = self.tiger ^ DOOR_SWAP
     # end def
 
     def print(self):
         """ Returns a string indicating the status of the environment.
         """
 
-        action_text      = {aListen: "listen",
-                            aLeft: "open left door",
-                            aRight: "open right door"}
-        observation_text = {oNull: "null",
-                            oLeft: "hear tiger at left door",
-                            oRight: "hear tiger at right door"}
-        reward_text      = {rEaten: "eaten",
-                            rListen: "listen",
-                            rGold: "gold!"}
-
         # Show what just happened, correcting the reward for being defined relative to 100.
         message = "action = %s, observation = %s, reward = %s (%d)" % \
-                  (action_text[self.action],
-                   observation_text[self.observation],
-                   reward_text[self.reward],
+                  (ACTION_TEXT[self.action],
+                   OBSERVATION_TEXT[self.observation],
+                   REWARD_TEXT[self.reward],
                    (self.reward - 100))
 
         return message
     # end def
+
+    def restore(self, snapshot):
+        """ Restores the state of the environment from the given snapshot, as returned by `snapshot()`.
+
+            - `snapshot`: the snapshot of the state to restore.
+        """
+
+        (self.tiger, self.gold, self.action, self.observation, self.reward) = snapshot
+    # end def
+
+    def snapshot(self):
+        """ Returns a snapshot of the state of the environment, which can later be given to `restore()`.
+        """
+
+        return (self.tiger, self.gold, self.action, self.observation, self.reward)
+    # end def
 # end class
\ No newline at end of file
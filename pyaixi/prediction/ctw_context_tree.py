@@ -4,20 +4,24 @@
 Define classes to implement context trees according to the Context Tree Weighting algorithm.
 """
 
-from __future__ import division
-from __future__ import print_function
-from __future__ import unicode_literals
-
 import math
 import random
 
-# Ensure xrange is defined on Python 3.
-from six.moves import xrange
-
 # The value ln(0.5).
 # This value is used often in computations and so is made a constant for efficiency reasons.
 log_half = math.log(0.5)
 
+# The number of visits to a node below which the logarithms of the KT-estimator update multipliers
+# are looked up in `log_kt_multiplier_table`, rather than calculated.
+log_kt_multiplier_table_size = 256
+
+# The logarithms of the KT-estimator update multipliers, `log((count + 1/2)/(visits + 1))`, for
+# small numbers of visits to a node, indexed by the number of visits and then the symbol count.
+# These are needed for every node on the context path, at every update and revert, so are worked
+# out once here rather than each time. (Larger numbers of visits are rarer, so are calculated.)
+log_kt_multiplier_table = [[math.log((count + 0.5) / (visits + 1)) for count in range(0, visits + 1)]
+                           for visits in range(0, log_kt_multiplier_table_size)]
+
 class CTWContextTreeNode:
     """ The CTWContextTreeNode class represents a node in an action-conditional context tree.
 
@@ -72,6 +76,9 @@ class CTWContextTreeNode:
         - The number of symbols (zeros and ones) in the history subsequence relevant to the
           node: `symbol_count`.
 
+        As the alphabet is binary, both of these are two-element lists indexed by symbol, rather
+        than dictionaries, with a missing child being null/None.
+
 
         The `CTWContextTreeNode` class is tightly coupled with the `ContextTree` class.
 
@@ -85,14 +92,20 @@ class CTWContextTreeNode:
           by the nodes.
     """
 
+    # Class attributes.
+
+    # Store the node's attributes in slots rather than an instance dictionary, as a tree can have
+    # a great many nodes, and their attributes are read at every update and revert.
+    __slots__ = ('children', 'log_kt', 'log_probability', 'symbol_count', 'tree', 'visit_count')
+
     # Instance methods.
 
     def __init__(self, tree = None):
         """ Construct a node of the context tree.
         """
 
-        # The children of this node.
-        self.children = {}
+        # The children of this node, indexed by symbol. (null/None where there's no child.)
+        self.children = [None, None]
 
         # The tree object associated with this node.
         self.tree = tree
@@ -109,7 +122,11 @@ class CTWContextTreeNode:
 
         # The count of the symbols in the history subsequence relevant to this node.
         # (Called `m_count` in the C++ version.)
-        self.symbol_count = {0: 0, 1: 0}
+        self.symbol_count = [0, 0]
+
+        # The number of times this context has been visited: the total of the symbol counts.
+        # Kept up to date by the update and revert methods, so it needn't be summed each time.
+        self.visit_count = 0
     # end def
 
     def is_leaf_node(self):
@@ -117,7 +134,7 @@ class CTWContextTreeNode:
         """
 
         # If this node has no children, it's a leaf node.
-        return self.children == {}
+        return self.children[0] is None and self.children[1] is None
     # end def
 
     def log_kt_multiplier(self, symbol):
@@ -139,8 +156,13 @@ class CTWContextTreeNode:
              1 corresponds to calculating `log(Pr_kt(1 | 0^a 1^b)`.
         """
 
+        visits = self.visit_count
+        if visits < log_kt_multiplier_table_size:
+            return log_kt_multiplier_table[visits][self.symbol_count[symbol]]
+        # end if
+
         numerator = self.symbol_count[symbol] + 0.5
-        denominator = self.visits() + 1
+        denominator = visits + 1
 
         return math.log(numerator / denominator)
     # end def
@@ -154,23 +176,21 @@ class CTWContextTreeNode:
         """
 
         # Decrease the count for this symbol.
-        symbol = int(symbol)
-        this_symbol_count = self.symbol_count[symbol]
-        if this_symbol_count > 1:
-            self.symbol_count[symbol] = this_symbol_count - 1
-        else:
-            self.symbol_count[symbol] = 0
+        # (The count never drops below zero.)
+        if self.symbol_count[symbol] > 0:
+            self.symbol_count[symbol] -= 1
+            self.visit_count -= 1
         # end if
 
         # If the number of visits to the child associated with this symbol is now zero,
         # this child is now redundant, and should be removed.
-        redundant_child = self.children.get(symbol, None)
-        if redundant_child is not None and (redundant_child.visits() == 0):
+        redundant_child = self.children[symbol]
+        if redundant_child is not None and (redundant_child.visit_count == 0):
             # Decrease the tree size by the size of the children of the redundant child.
             self.tree.tree_size -= redundant_child.size()
 
-            del self.children[symbol]
-            del redundant_child
+            self.children[symbol] = None
+            self.tree.release_node(redundant_child)
         # end if
 
         # Revert the KT estimate.
@@ -184,8 +204,26 @@ class CTWContextTreeNode:
         """ The number of descendants of this node.
         """
 
-        # Iterate over the direct children of this node, collecting the size of each sub-tree.
-        return 1 + sum([child.size() for child in self.children.values()])
+        # Count the nodes of the sub-tree using a list of nodes still to visit, rather than by
+        # calling this method recursively for each child.
+        # (This is only needed when `revert` removes an unvisited child, whose sub-tree is almost
+        # always just a few nodes, so it's counted here rather than kept up to date in every node.)
+        size = 0
+        nodes = [self]
+        while nodes:
+            node = nodes.pop()
+            size += 1
+
+            (child_0, child_1) = node.children
+            if child_0 is not None:
+                nodes.append(child_0)
+            # end if
+            if child_1 is not None:
+                nodes.append(child_1)
+            # end if
+        # end while
+
+        return size
     # end def
 
     def update(self, symbol):
@@ -203,6 +241,7 @@ class CTWContextTreeNode:
 
         # Update the count for this symbol.
         self.symbol_count[symbol] += 1
+        self.visit_count += 1
     # end def
 
     def update_log_probability(self):
@@ -244,26 +283,33 @@ class CTWContextTreeNode:
         # If the current node is a leaf node (i.e. it has no children), this is just the KT estimate.
         # Otherwise, it is an even mixture of the KT estimate, and the product of the
         # weighted probabilities of the children.
-        if self.children == {}:
+        (child_0, child_1) = self.children
+        if child_0 is None and child_1 is None:
             self.log_probability = self.log_kt
         else:
             # Calculate the sum of the log weighted probabilities of the child nodes.
-            log_child_probability = math.fsum([child.log_probability for child in self.children.values()])
+            # (A single addition of two values is already exactly rounded, as `math.fsum` would be.)
+            if child_0 is None:
+                log_child_probability = child_1.log_probability
+            elif child_1 is None:
+                log_child_probability = child_0.log_probability
+            else:
+                log_child_probability = child_0.log_probability + child_1.log_probability
+            # end if
 
             # Calculate the log weighted probability.
             # Use the formulation which has the least chance of overflow.
 
-            # Set 'a' to be the maximum of log_kt and log_child_probability, and 'b' to be the minimum.
-            if self.log_kt >= log_child_probability:
-                a = self.log_kt
-                b = log_child_probability
+            # Take 'a' to be the maximum of log_kt and log_child_probability, and 'b' to be the minimum,
+            # and use Python's log1p function to perform `log(1.0 + exp(b - a))`.
+            # (Branching once on the sign of their difference, which is `b - a` or `a - b` exactly.)
+            log_kt = self.log_kt
+            difference = log_child_probability - log_kt
+            if difference <= 0.0:
+                self.log_probability = log_half + log_kt + math.log1p(math.exp(difference))
             else:
-                a = log_child_probability
-                b = self.log_kt
+                self.log_probability = log_half + log_child_probability + math.log1p(math.exp(-difference))
             # end if
-
-            # Use Python's log1p function to perform `log(1.0 + exp(b - a))`.
-            self.log_probability = log_half + a + math.log1p(math.exp(b - a))
         # end if
     # end def
 
@@ -272,7 +318,8 @@ class CTWContextTreeNode:
             This is the sum of the visits of the (immediate) child nodes.
         """
 
-        return self.symbol_count[0] + self.symbol_count[1]
+        # This is kept up to date as the symbol counts change.
+        return self.visit_count
     # end def
 # end class
 
@@ -308,11 +355,13 @@ class CTWContextTree:
            sampling.
     """
 
-    def __init__(self, depth):
+    def __init__(self, depth, rng = random):
         """ Create a context tree of specified maximum depth.
             Nodes are created as needed.
 
             - `depth`: the maximum depth of the context tree.
+            - `rng`: the random number generator to sample symbols with.
+                     (Default: the global `random` module.)
         """
 
         # An list used to hold the nodes in the context tree that correspond to the current context.
@@ -325,9 +374,21 @@ class CTWContextTree:
         assert depth >= 0, "The given tree depth must be greater than zero."
         self.depth = depth
 
-        # The history (a list) of symbols seen by the tree.
+        # The nodes removed from the tree, kept to be reused when new nodes are needed, rather than
+        # being freed and allocated again.
+        self.free_nodes = []
+
+        # The history of symbols seen by the tree.
+        # (A byte array, holding each symbol in a single byte rather than as a reference to a
+        #  Python integer object, but otherwise used as a list of integers would be.)
         # (Called `m_history` in the C++ version.)
-        self.history = []
+        self.history = bytearray()
+
+        # The random number generator used to sample symbols.
+        self.rng = rng
+
+        # The generator's `random()` method, bound once, as it's called for every sampled symbol.
+        self.random = rng.random
 
         # The root node of the context tree.
         # (Called `m_root` in the C++ version.)
@@ -342,7 +403,7 @@ class CTWContextTree:
         """
 
         # Reset the history.
-        self.history = []
+        self.history = bytearray()
 
         # Set a new root object, and reset the tree size.
         self.root.tree = None
@@ -350,8 +411,9 @@ class CTWContextTree:
         self.root = CTWContextTreeNode(tree = self)
         self.tree_size = 1
 
-        # Reset the context.
+        # Reset the context, and forget any nodes kept for reuse.
         self.context = []
+        self.free_nodes = []
     # end def
 
     def generate_random_symbols(self, symbol_count):
@@ -361,7 +423,8 @@ class CTWContextTree:
 
             (Called `genRandomSymbols` in the C++ version.)
         """
-        symbol_list = self.generate_random_symbols_and_update(symbol_list, symbol_count)
+
+        symbol_list = self.generate_random_symbols_and_update(symbol_count)
         self.revert(symbol_count)
 
         return symbol_list
@@ -378,9 +441,9 @@ class CTWContextTree:
         """
 
         symbol_list = []
-        for i in xrange(0, symbol_count):
+        for i in range(0, symbol_count):
             # Pick either 0 or 1 based on the probability of the symbol 1 occuring in the context tree.
-            symbol = 1 if (random.random() < self.predict(1)) else 0
+            symbol = 1 if (self.random() < self.predict_symbol(1)) else 0
             symbol_list += [symbol]
             self.update(symbol)
         # end for
@@ -402,17 +465,22 @@ class CTWContextTree:
                             0 corresponds to `rho(0 | h)` and 1 to `rho(1 | h)`.
         """
 
-        # Ensure that we have a list, by making this a list if it's a single symbol.
-        if type(symbol_list) != list:
-            symbol_list = [symbol_list]
+        # A single symbol can be predicted without updating and reverting the tree in turn.
+        # (Whether it's given on its own, or as the only symbol in a list or tuple.)
+        if isinstance(symbol_list, int):
+            return self.predict_symbol(symbol_list)
         # end if
 
+        symbol_list_length = len(symbol_list)
+        if symbol_list_length == 1:
+            return self.predict_symbol(symbol_list[0])
+        # end if
 
         # If there is insufficient context for a prediction, return the uniform
         # prediction 0.5 ^ length.
-        symbol_list_length = len(symbol_list)
         if ((len(self.history) + symbol_list_length) <= self.depth):
-            return 0.5 if symbol_list_length == 1 else math.pow(0.5, symbol_list_length)
+            # (An exact power of two, worked out without a floating-point power function call.)
+            return 1.0 / (1 << symbol_list_length)
         # end if
 
         # Calculate the probability of the symbol s given the history h using
@@ -425,6 +493,93 @@ class CTWContextTree:
         return math.exp(prob_sequence - prob_history)
     # end def
 
+    def predict_symbol(self, symbol):
+        """ Returns the conditional probability of a single symbol, considering the history.
+
+            This gives the same result, and leaves the tree in the same state, as `predict(symbol)`
+            would by updating the tree with the symbol and then reverting it. But it walks the
+            context only once: working out each node's log probability after the update, then
+            putting the node back as the revert would, before moving on to its parent.
+
+            - `symbol`: the symbol to estimate the conditional probability of.
+                        0 corresponds to `rho(0 | h)` and 1 to `rho(1 | h)`.
+        """
+
+        # If there is insufficient context for a prediction, return the uniform prediction.
+        if len(self.history) < self.depth:
+            return 0.5
+        # end if
+
+        symbol = int(symbol)
+        prob_history = self.root.log_probability
+        self.update_context()
+        context = self.context
+
+        # The log probability after the update of the node below the current one in the context.
+        # (The leaf node at the end of the context is neither updated nor reverted.)
+        child_updated_log_probability = context[self.depth].log_probability if self.depth > 0 else 0.0
+
+        # Step backwards through the nodes in the context in reverse context order, as `update` and
+        # `revert` would. (Only go as deep as the current tree depth, though.)
+        for index in range(self.depth - 1, -1, -1):
+            node = context[index]
+            child = context[index + 1]
+            multiplier = node.log_kt_multiplier(symbol)
+
+            # Work out the node's log probability as the update would, from the updated child.
+            child_reverted_log_probability = child.log_probability
+            child.log_probability = child_updated_log_probability
+            node.log_kt += multiplier
+            node.update_log_probability()
+            updated_log_probability = node.log_probability
+            child.log_probability = child_reverted_log_probability
+
+            # Revert the KT estimate, as the revert would. (The result isn't always exactly the
+            # original value, so it's kept as it is rather than restored.)
+            node.log_kt -= multiplier
+
+            # Remove the child associated with this symbol if it has never been visited, as the
+            # revert would.
+            redundant_child = node.children[symbol]
+            if redundant_child is not None and (redundant_child.visit_count == 0):
+                # Decrease the tree size by the size of the children of the redundant child.
+                self.tree_size -= redundant_child.size()
+
+                node.children[symbol] = None
+                self.release_node(redundant_child)
+            # end if
+
+            # Update the weighted probability, as the revert would.
+            node.update_log_probability()
+
+            child_updated_log_probability = updated_log_probability
+        # end for
+
+        # Calculate the probability of the symbol s given the history h using
+        # p(s | h) = p(hs) / p(h) = exp(ln p(hs) - ln p(h)).
+        prob_sequence = child_updated_log_probability if self.depth > 0 else prob_history
+
+        return math.exp(prob_sequence - prob_history)
+    # end def
+
+    def release_node(self, node):
+        """ Keeps a node that has been removed from the tree, to be reused as a new node.
+            Its state is reset to that of a newly-created node, and its children discarded.
+
+            - `node`: the node removed from the tree.
+        """
+
+        node.children[0] = None
+        node.children[1] = None
+        node.log_kt = 0.0
+        node.log_probability = 0.0
+        node.symbol_count[0] = 0
+        node.symbol_count[1] = 0
+        node.visit_count = 0
+
+        self.free_nodes.append(node)
+    # end def
+
     def revert(self, symbol_count = 1):
         """ Restores the context tree to its state prior to a specified number of updates.
      
@@ -432,7 +587,7 @@ class CTWContextTree:
         """
 
         # Traverse the tree from leaf to root according to the context.
-        for i in xrange(0, symbol_count):
+        for i in range(0, symbol_count):
             # Check if we have updates to revert.
             if len(self.history) == 0:
                 return
@@ -448,8 +603,10 @@ class CTWContextTree:
 
                 # Step backwards through the nodes in the context in reverse context order.
                 # (Only go as deep as the current tree depth, though.)
-                for context_node in reversed(self.context[:self.depth]):
-                    context_node.revert(symbol)
+                # (Indexing the context directly, rather than copying it into a reversed slice.)
+                context = self.context
+                for index in range(self.depth - 1, -1, -1):
+                    context[index].revert(symbol)
                 # end for
             # end if
         # end for
@@ -465,8 +622,9 @@ class CTWContextTree:
         history_length = len(self.history)
         assert history_length >= symbol_count, "The given symbol count must be greater than the history length."
 
+        # Truncate the history in place, rather than copying the remaining symbols into a new list.
         new_size = history_length - symbol_count
-        self.history = self.history[:new_size]
+        del self.history[new_size:]
     # end def
 
     def size(self):
@@ -485,27 +643,32 @@ class CTWContextTree:
                               (The context tree is updated with symbols in the order they appear in the list.)
         """
 
-        # Ensure that we have a list, by making this a list if it's a single symbol.
-        if type(symbol_list) != list:
-            symbol_list = [symbol_list]
+        # Accept a single symbol, or any sequence (a list or tuple, say) of symbols.
+        if isinstance(symbol_list, int):
+            symbol_list = (symbol_list,)
         # end if
 
         # Traverse the tree from leaf to root according to the context.
         for symbol in symbol_list:
             # Update the probabilities and symbol counts for each node.
+            # (Symbols are made integers here, and by `update_history`, so the history only holds
+            #  integers, and the nodes and `update_context` can use them as they are.)
             symbol = int(symbol)
+            assert symbol in (0, 1), "The given symbol must be 0 or 1."
             if len(self.history) >= self.depth:
                 self.update_context()
 
                 # Step backwards through the nodes in the context in reverse context order.
                 # (Only go as deep as the current tree depth, though.)
-                for context_node in reversed(self.context[:self.depth]):
-                    context_node.update(symbol)
+                # (Indexing the context directly, rather than copying it into a reversed slice.)
+                context = self.context
+                for index in range(self.depth - 1, -1, -1):
+                    context[index].update(symbol)
                 # end for
             # end if
 
             # Add this symbol to the history.
-            self.update_history(symbol)
+            self.history.append(symbol)
         # end for
     # end def
 
@@ -531,14 +694,15 @@ class CTWContextTree:
         update_depth = 1
         for symbol in reversed(self.history):
             # Find the relevant child node of the current node for the current symbol, if it exists.
-            symbol = int(symbol)
-            if symbol in node.children:
-                node = node.children[symbol]
+            child = node.children[symbol]
+            if child is not None:
+                node = child
             else:
                 # No child exists for this symbol.
 
                 # Create a new node for the context, and add it into the tree under the current symbol.
-                new_node = CTWContextTreeNode(tree = self)
+                # (Reusing a removed node, if there are any.)
+                new_node = self.free_nodes.pop() if self.free_nodes else CTWContextTreeNode(tree = self)
                 node.children[symbol] = new_node
 
                 # Increase the size of the tree by 1, for the new node.
@@ -568,11 +732,12 @@ class CTWContextTree:
             (Called `updateHistory` in the C++ version.)
         """
 
-        # Ensure that we have a list, by making this a list if it's a single symbol.
-        if type(symbol_list) != list:
-            symbol_list = [symbol_list]
+        # Accept a single symbol, or any sequence (a list or tuple, say) of symbols.
+        # (Making sure each is an integer, as `update_context` uses them as they are.)
+        if isinstance(symbol_list, int):
+            self.history.append(int(symbol_list))
+        else:
+            self.history.extend([int(symbol) for symbol in symbol_list])
         # end if
-
-        self.history += symbol_list
     # end def
 # end class
\ No newline at end of file
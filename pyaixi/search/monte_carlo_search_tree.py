@@ -4,19 +4,7 @@
 Define a class to implement a Monte Carlo search tree.
 """
 
-from __future__ import division
-from __future__ import print_function
-from __future__ import unicode_literals
-
-import os
 import math
-import random
-import sys
-
-# Insert the package's parent directory into the system search path, so that this package can be
-# imported when the aixi.py script is run directly from a release archive.
-PROJECT_ROOT = os.path.realpath(os.path.join(os.pardir, os.pardir))
-sys.path.insert(0, PROJECT_ROOT)
 
 from pyaixi import util
 
@@ -31,6 +19,16 @@ nodetype_enum = util.enum('chance', 'decision')
 chance_node = nodetype_enum.chance
 decision_node = nodetype_enum.decision
 
+# The number of visits to a node below which the logarithms of the visit counts are looked up in
+# `log_visits_table`, rather than calculated.
+log_visits_table_size = 4096
+
+# The logarithms of the numbers of visits to a node, indexed by the number of visits.
+# These are needed every time an action is selected at a node, so are worked out once here rather
+# than each time. (Larger numbers of visits are rarer, so are calculated.)
+# (The logarithm of zero is undefined, but actions are only selected at visited nodes.)
+log_visits_table = [0.0] + [math.log(visits) for visits in range(1, log_visits_table_size)]
+
 class MonteCarloSearchNode:
     """ A class to represent a node in the Monte Carlo search tree.
         The nodes in the search tree represent simulated actions and percepts
@@ -67,6 +65,10 @@ class MonteCarloSearchNode:
 
     # Class attributes.
 
+    # Store the node's attributes in slots rather than an instance dictionary, as a search can
+    # create a great many nodes.
+    __slots__ = ('children', 'mean', 'type', 'visits')
+
     # Exploration constant for the UCB action policy.
     exploration_constant = 2.0
 
@@ -107,95 +109,145 @@ class MonteCarloSearchNode:
             - `horizon`: how many cycles into the future to sample
         """
 
+        # Walk down the tree from this node, one step at a time, rather than sampling each node
+        # below recursively, keeping the path taken, and the reward from each step along it.
+        # The expected rewards of the nodes on the path are then updated on the way back up.
+        path = []
+        node = self
+
+        # Work out the scale of the exploration term in the UCB formula, from the largest reward in
+        # the environment's reward range, and the actions to choose between, once for the whole
+        # sample, rather than at every decision node on the way.
+        environment = agent.environment
+        explore_bias = float(agent.horizon * environment.reward_range[1])
+        actions = environment.valid_actions
+
         # Set an initial reward.
         reward = 0.0
 
-        # Do we need to continue sampling, or use a playout policy?
-        # Have we already reached the given horizon or the maximum search depth?
-        if (horizon == 0):
-            # Yes, we've reached the maximum search depth.
-            # Return the initial reward.
-            return reward
-        elif (self.type == chance_node):
-            # We're at a chance node, so we need to continue sampling.
-
-            # Generate a percept at random using the agent's environment model,
-            # and continue sampling.
-            observation, random_reward = agent.generate_percept_and_update()
-
-            # If this observation is new to this node, add it as a decision observation child node.
-            if observation not in self.children:
-                self.children[observation] = MonteCarloSearchNode(decision_node)
-            # end def
-            observation_child = self.children[observation]
-
-            # Get the reward for this observation by continuing the search recursively onto the child.
-            reward = random_reward + observation_child.sample(agent, horizon - 1)
-        elif (self.visits == 0):
-            # We are at an (unvisited) decision node.
-            # Either the node is previously unvisited, or we have exceeded the maximum tree depth.
-            # Either way, use the playout policy to estimate the future reward.
-            reward = agent.playout(horizon)
-        else:
-            # We are at a previously-visited decision node.
-            # Choose an action according to the UCB policy and continue sampling.
-            action = self.select_action(agent)
-            agent.model_update_action(action)
-
-            # If this action is new to this node, add it as a chance action child node.
-            # Do we have a child corresponding to this action?
-            if action not in self.children:
-                # No. Create one.
-                self.children[action] = MonteCarloSearchNode(chance_node)
-            # end def
-            action_child = self.children[action]
+        while True:
+            # Do we need to continue sampling, or use a playout policy?
+            # Have we already reached the given horizon or the maximum search depth?
+            if (horizon == 0):
+                # Yes, we've reached the maximum search depth.
+                # Keep the initial reward. (This node itself isn't updated.)
+                break
+            elif (node.type == chance_node):
+                # We're at a chance node, so we need to continue sampling.
+
+                # Generate a percept at random using the agent's environment model,
+                # and continue sampling.
+                observation, random_reward = agent.generate_percept_and_update()
+
+                # If this observation is new to this node, add it as a decision observation child node.
+                observation_child = node.children.get(observation, None)
+                if observation_child is None:
+                    observation_child = node.children[observation] = MonteCarloSearchNode(decision_node)
+                # end if
+
+                # The reward for this observation is added to that found by continuing the search
+                # onto the child.
+                path.append((node, random_reward))
+                node = observation_child
+                horizon -= 1
+            elif (node.visits == 0):
+                # We are at an (unvisited) decision node.
+                # Either the node is previously unvisited, or we have exceeded the maximum tree depth.
+                # Either way, use the playout policy to estimate the future reward.
+                reward = agent.playout(horizon)
+                path.append((node, None))
+                break
+            else:
+                # We are at a previously-visited decision node.
+                # Choose an action according to the UCB policy and continue sampling.
+                action = node.select_action(agent, explore_bias, actions)
+                agent.model_update_action(action)
+
+                # If this action is new to this node, add it as a chance action child node.
+                # Do we have a child corresponding to this action?
+                action_child = node.children.get(action, None)
+                if action_child is None:
+                    # No. Create one.
+                    action_child = node.children[action] = MonteCarloSearchNode(chance_node)
+                # end if
+
+                # The reward for this action is that found by continuing the search onto the child.
+                # NOTE: should this be horizon - 1, like for the observation child above?
+                #       (The C++ version is just the horizon as well.)
+                path.append((node, None))
+                node = action_child
+            # end if
+        # end while
 
-            # Get the reward for this action by continuing the search recursively onto the child.
-            # NOTE: should this be horizon - 1, like observation_child_sample above?
-            #       (The C++ version is just the horizon as well.)
-            reward = action_child.sample(agent, horizon)
-        # end def
+        # Step back up the path taken, from the deepest node to this one.
+        for (node, step_reward) in reversed(path):
+            # Add any reward from the step down from this node.
+            if step_reward is not None:
+                reward = step_reward + reward
+            # end if
 
-        # Update the expected reward and number of visits to the current node.
-        visits = float(self.visits)
-        self.mean = (reward + (visits * self.mean)) / (visits + 1.0)
-        self.visits += 1
+            # Update the expected reward and number of visits to the current node.
+            # (The integer visit count is converted exactly in the arithmetic, so needn't be made a float.)
+            visits = node.visits
+            node.mean = (reward + (visits * node.mean)) / (visits + 1)
+            node.visits = visits + 1
+        # end for
 
         # Return the calculated reward.
         return reward
     # end def
 
-    def select_action(self, agent):
+    def select_action(self, agent, explore_bias = None, actions = None):
         """ Returns an action selected according to UCB policy.
 
              - `agent`: the agent which is doing the sampling.
+             - `explore_bias`: the scale of the exploration term in the UCB formula.
+                               Defaults to the largest reward the agent could accumulate over its horizon.
+             - `actions`: the actions to choose between.
+                          Defaults to the valid actions of the agent's environment.
 
             (Called `selectAction` in the C++ version.)
         """
 
-        explore_bias = float(agent.horizon * agent.maximum_reward())
-        exploration_numerator = (self.exploration_constant * math.log(self.visits))
+        # Work out any values not given. (`sample` works these out once per sample, and passes them in.)
+        if explore_bias is None:
+            explore_bias = float(agent.horizon * agent.environment.reward_range[1])
+        # end if
+
+        if actions is None:
+            actions = agent.environment.valid_actions
+        # end if
+
+        visits = self.visits
+        log_visits = log_visits_table[visits] if visits < log_visits_table_size else math.log(visits)
+        exploration_numerator = (self.exploration_constant * log_visits)
+
+        # Look up the methods and values used for every action once, before the loop.
+        get_child = self.children.get
+        random = agent.random
+        sqrt = math.sqrt
+        unexplored_bias = self.unexplored_bias
 
         # Compute the best action according to the UCB formula.
         best_action = None
         best_priority = float("-inf")
-        for action in agent.environment.valid_actions:
+        for action in actions:
             # Find any children nodes related to this action.
-            node = self.children.get(action, None)
+            node = get_child(action, None)
 
             # Use the UCB formula to determine priority of this node.
             priority = 0.0
             if (node is None or node.visits == 0):
                 # This is a previously unexplored node.
                 # Give it the unexplored bias.
-                priority = self.unexplored_bias
+                priority = unexplored_bias
             else:
                 # This is a previously explored node.
-                priority = node.mean + (explore_bias * math.sqrt(exploration_numerator / node.visits))
+                priority = node.mean + (explore_bias * sqrt(exploration_numerator / node.visits))
             # end def
 
             # Update the best action if necessary, breaking ties randomly.
-            if (priority > (best_priority + (random.random() * 0.001))):
+            if (priority > (best_priority + (random() * 0.001))):
                 best_action = action
                 best_priority = priority
             # end if
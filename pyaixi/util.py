@@ -4,38 +4,27 @@
 Define some helper functions.
 """
 
-from __future__ import division
-from __future__ import print_function
-
+import collections
 import random
 
-try:
-    import collections
-    IterableUserDict = collections.UserDict
-except:
-    import UserDict
-    IterableUserDict = UserDict.IterableUserDict
-# end try
-
-# Ensure xrange is defined on Python 3.
-from six.moves import xrange
-
 def bits_required(integer_value):
     """ Return the number of bits required to store the given integer.
     """
     assert type(integer_value) == int and integer_value >= 0, "The given number must be an integer greater than or equal to zero."
 
-    # The bin built-in function converts the value to a binary string, but adds an '0b' prefix.
-    # Count the length of the string, but subtract 2 for the '0b' prefix.
-    return len(bin(integer_value)) - 2
+    # Zero still needs one bit.
+    return integer_value.bit_length() or 1
 # end def
 
-def choice(seq):
+def choice(seq, generator = random):
     """ Choose a random element from a non-empty sequence.
         (Based on the Python 2.x code for random.choice, and used for deterministic results across
          platforms as Python 3.x changed the way random.choice worked.)
+
+        - `seq` - the sequence to choose from.
+        - `generator` - the random number generator to use. (Default: the global `random` module.)
     """
-    return seq[int(random.random() * len(seq))] # raises IndexError if seq is empty
+    return seq[int(generator.random() * len(seq))] # raises IndexError if seq is empty
 # end def
 
 def decode(symbol_list, bit_count):
@@ -61,37 +50,25 @@ def decode(symbol_list, bit_count):
 # end def
 
 def encode(integer_symbol, bit_count):
-    """ Returns an updated version of the given symbol list with the given symbol encoded into binary.
+    """ Returns a list of symbols encoding the given value into binary.
+        Each symbol is a bit in the binary representation of the value, with more significant
+        bits at the end of the list, so that `decode` recovers the value.
 
-        - `symbol_list` - the list onto which to encode the value.
         - `integer_symbol` - the integer value to be encoded.
-        - `bit_count` - the number of bits from the end of the symbol list to decode.
+        - `bit_count` - the number of bits to encode the value into.
     """
 
     assert type(integer_symbol) == int and integer_symbol >= 0, "The given symbol must be an integer greater than or equal to zero."
 
-    # Convert the symbol into a bit string.
-    bit_string = bin(integer_symbol)
-
-    # Strip off any '0b' prefix.
-    if bit_string.startswith('0b'):
-        bit_string = bit_string[2:]
-    # end if
-
-    # Convert the string into a list of integers.
-    bits = [int(bit) for bit in list(bit_string)]
-
     # Check that the number of bits is not bigger than the given bit count.
-    bits_length = len(bits)
+    bits_length = bits_required(integer_symbol)
     assert bit_count >= bits_length, \
            "The given number of bits %d to encode is smaller than the bits needed to encode %d." % \
                (bit_count, bits_length)
 
-    # Calculate how many bits we need to pad the bit string with, if any, and pad with zeros.
-    pad_list = [0 for i in xrange(0, bits_length - bit_count)]
-
-    # Return the newly created bit list, with the zero padding first.
-    symbol_list = pad_list + bits
+    # Return the bits of the value, least significant first, padded with zeros up to the
+    # given bit count, so that every value is encoded into the same number of symbols.
+    symbol_list = [(integer_symbol >> i) & 1 for i in range(0, bit_count)]
     return symbol_list
 # end def
 
@@ -115,7 +92,8 @@ def enum(*sequential, **named):
 
     # Set up a dictionary (with user-modifiable attributes) from the reverse mapping,
     # so that iteration over the enumeration and membership checks are possible.
-    enums = IterableUserDict(reverse)
+    # (Both are over the enumeration's distinct values, so names sharing a value count once.)
+    enums = collections.UserDict(reverse)
 
     # Add the original and reverse mappings to the dictionary.
     enums.mapping = enum_dict